@@ -1,21 +1,172 @@
 from __future__ import annotations
 
 import argparse
+import functools
+import json
 import logging
-from collections import defaultdict
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from src.ai_pipeline import AIResult, collect_markdown_files, run_ai_pipeline
-from src.chunking import ChunkPlan, build_chunk_plan, save_chunk_plan
-from src.config import Settings
-from src.conversion import ConversionResult, convert_pdfs_to_markdown
+from src.chunking import ChunkPlan, build_chunk_plans_parallel, count_words, get_token_counter, save_chunk_plan
+from src.config import CHUNKING_MODES, DEFAULT_PROMPT_DISPLAYS, DEFAULT_TOKEN_COUNTER_MODEL, Settings
+from src.conversion import ConversionResult, convert_pdfs_to_markdown, markdown_is_current, scan_pdf_entries
 from token_count import TokenCount
 
 logger = logging.getLogger(__name__)
 
 
-def parse_args() -> argparse.Namespace:
+TOKEN_COUNT_CACHE_PATH = Path(".docling_cache") / "tokcounts.json"
+SUMMARY_IO_WORKERS = 8
+STREAM_COUNT_THRESHOLD_BYTES = 8 * 1024 * 1024
+STREAM_COUNT_BLOCK_CHARS = 1024 * 1024
+
+_token_count_cache: Dict[str, dict] | None = None
+_token_count_cache_dirty = False
+
+
+def _load_token_count_cache() -> Dict[str, dict]:
+    global _token_count_cache
+    if _token_count_cache is None:
+        try:
+            _token_count_cache = json.loads(TOKEN_COUNT_CACHE_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            _token_count_cache = {}
+    return _token_count_cache
+
+
+def _save_token_count_cache() -> None:
+    global _token_count_cache_dirty
+    if not _token_count_cache_dirty or _token_count_cache is None:
+        return
+    try:
+        TOKEN_COUNT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        TOKEN_COUNT_CACHE_PATH.write_text(json.dumps(_token_count_cache), encoding="utf-8")
+    except OSError as exc:
+        logger.warning("Failed to write token count cache %s: %s", TOKEN_COUNT_CACHE_PATH, exc)
+        return
+    _token_count_cache_dirty = False
+
+
+@functools.lru_cache(maxsize=8)
+def _read_markdown_cached(path: Path, mtime_ns: int) -> str:
+    return path.read_text(encoding="utf-8")
+
+
+def _read_markdown(path: Path, stat: os.stat_result) -> str:
+    """Return the text of ``path``, reusing recent reads while the file is unchanged.
+
+    Only files up to the streaming threshold are kept, in a small ``(path, mtime)`` cache,
+    so large documents are never pinned in memory for the rest of the run.
+    """
+
+    if stat.st_size > STREAM_COUNT_THRESHOLD_BYTES:
+        return path.read_text(encoding="utf-8")
+    return _read_markdown_cached(path, stat.st_mtime_ns)
+
+
+def _count_file_stream(path: Path, token_counter: TokenCount) -> Tuple[int | None, int]:
+    """Count ``(tokens, words)`` reading ``path`` in blocks instead of loading it whole.
+
+    Blocks are cut at the last newline so words never straddle two blocks; token counts
+    may differ from a full-text count by a few tokens at block boundaries.
+    """
+
+    tokens: int | None = 0
+    words = 0
+    carry = ""
+    with path.open(encoding="utf-8") as handle:
+        while True:
+            block = handle.read(STREAM_COUNT_BLOCK_CHARS)
+            if not block:
+                break
+            block = carry + block
+            cut = block.rfind("\n") + 1
+            if not cut:
+                carry = block
+                continue
+            piece, carry = block[:cut], block[cut:]
+            tokens = _add_tokens(tokens, token_counter.num_tokens_from_string(piece))
+            words += count_words(piece)
+    if carry:
+        tokens = _add_tokens(tokens, token_counter.num_tokens_from_string(carry))
+        words += count_words(carry)
+    return tokens, words
+
+
+def _add_tokens(total: int | None, count: int | None) -> int | None:
+    """Sum block token counts; one failed block makes the whole count unknown."""
+
+    if total is None or count is None:
+        return None
+    return total + count
+
+
+def _list_directory_names(directory: Path) -> set[str]:
+    """Return the entry names of ``directory`` with a single listing (empty if missing)."""
+
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries}
+    except OSError:
+        return set()
+
+
+def _count_stamp(stat: os.stat_result, model_name: str) -> str:
+    # TokenCount does not expose its model, so callers pass the configured name explicitly.
+    return f"{model_name}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _remember_counts(path: Path, model_name: str, tokens: int | None, words: int) -> None:
+    """Seed the token count cache with counts that were already computed for ``path``."""
+
+    global _token_count_cache_dirty
+    if tokens is None:
+        return
+    try:
+        stat = path.stat()
+    except OSError:
+        return
+    cache = _load_token_count_cache()
+    cache[str(path.resolve())] = {
+        "stamp": _count_stamp(stat, model_name),
+        "tokens": tokens,
+        "words": words,
+    }
+    _token_count_cache_dirty = True
+
+
+def _count_cached(path: Path, token_counter: TokenCount, model_name: str) -> Tuple[int | None, int]:
+    """Return ``(tokens, words)`` for ``path``, reusing counts while the file is unchanged."""
+
+    global _token_count_cache_dirty
+    stat = path.stat()
+    stamp = _count_stamp(stat, model_name)
+    cache = _load_token_count_cache()
+    key = str(path.resolve())
+
+    entry = cache.get(key)
+    if entry and entry.get("stamp") == stamp:
+        return int(entry["tokens"]), int(entry["words"])
+
+    if stat.st_size > STREAM_COUNT_THRESHOLD_BYTES:
+        tokens, words = _count_file_stream(path, token_counter)
+    else:
+        text = _read_markdown(path, stat)
+        tokens = token_counter.num_tokens_from_string(text)
+        words = count_words(text)
+    # A failed count is retried on the next run instead of being cached.
+    if tokens is not None:
+        cache[key] = {"stamp": stamp, "tokens": tokens, "words": words}
+        _token_count_cache_dirty = True
+    return tokens, words
+
+
+@functools.cache
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="PDF → Markdown → OpenAI processing pipeline."
     )
@@ -29,6 +180,11 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--md-dir", type=Path, help="Override Markdown output directory.")
     parser.add_argument("--ai-dir", type=Path, help="Override AI output directory.")
     parser.add_argument("--ai-model", help="OpenAI model to use for responses.")
+    parser.add_argument(
+        "--ai-concurrency",
+        type=int,
+        help="Máximo de requisições simultâneas à OpenAI.",
+    )
     parser.add_argument(
         "--token-counter-model",
         help="Tokenizer model identifier used to estimate token counts.",
@@ -58,6 +214,31 @@ def parse_args() -> argparse.Namespace:
         type=float,
         help="Custo estimado por 1k tokens de entrada para cálculo de orçamento.",
     )
+    parser.add_argument(
+        "--conversion-workers",
+        type=int,
+        help="Processos usados na conversão dos PDFs pelo Docling (0 = número de CPUs).",
+    )
+    parser.add_argument(
+        "--chunking-workers",
+        type=int,
+        help="Processos usados para planejar o chunking dos documentos (0 = automático).",
+    )
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Envia as requisições pela Batch API da OpenAI (conclusão em até 24h, custo menor).",
+    )
+    parser.add_argument(
+        "--input-batching",
+        action="store_true",
+        help="Agrupa documentos pequenos (um único chunk) em uma só requisição por prompt.",
+    )
+    parser.add_argument(
+        "--response-cache",
+        action="store_true",
+        help="Reaproveita respostas anteriores para prompts idênticos (cache SQLite no diretório da IA).",
+    )
     parser.add_argument(
         "--system-prompt",
         help="Inline system prompt. If combined with --system-prompt-file, the file wins.",
@@ -87,7 +268,11 @@ def parse_args() -> argparse.Namespace:
         default="INFO",
         help="Logging level (DEBUG, INFO, WARNING, ERROR).",
     )
-    return parser.parse_args()
+    return parser
+
+
+def parse_args() -> argparse.Namespace:
+    return _build_parser().parse_args()
 
 
 def apply_overrides(settings: Settings, args: argparse.Namespace) -> None:
@@ -99,6 +284,8 @@ def apply_overrides(settings: Settings, args: argparse.Namespace) -> None:
         settings.ai_output_dir = args.ai_dir
     if args.ai_model:
         settings.openai_model = args.ai_model
+    if args.ai_concurrency is not None:
+        settings.ai_max_concurrency = max(1, args.ai_concurrency)
     if args.token_counter_model:
         settings.token_counter_model = args.token_counter_model
 
@@ -112,6 +299,10 @@ def apply_overrides(settings: Settings, args: argparse.Namespace) -> None:
         settings.chunk_overlap_tokens = max(0, args.chunk_overlap)
     if args.chunk_price_input is not None:
         settings.chunk_pricing_input_per_1k = max(0.0, args.chunk_price_input)
+    if args.chunking_workers is not None:
+        settings.chunking_workers = max(0, args.chunking_workers)
+    if args.conversion_workers is not None:
+        settings.conversion_workers = max(0, args.conversion_workers)
 
     if args.system_prompt_file and args.system_prompt_file.exists():
         settings.system_prompt = args.system_prompt_file.read_text(encoding="utf-8")
@@ -124,10 +315,15 @@ def apply_overrides(settings: Settings, args: argparse.Namespace) -> None:
 
     if args.skip_existing_ai:
         settings.skip_existing_ai_outputs = True
+    if args.batch_api:
+        settings.use_batch_api = True
+    if args.input_batching:
+        settings.enable_input_batching = True
+    if args.response_cache:
+        settings.enable_response_cache = True
 
     settings.chunking_mode = settings.chunking_mode.lower()
-    if settings.chunking_mode not in {"auto", "force", "off"}:
-        logger = logging.getLogger(__name__)
+    if settings.chunking_mode not in CHUNKING_MODES:
         logger.warning("Invalid chunking mode %s; falling back to auto", settings.chunking_mode)
         settings.chunking_mode = "auto"
 
@@ -140,17 +336,22 @@ def apply_overrides(settings: Settings, args: argparse.Namespace) -> None:
 
 def execute_conversion(settings: Settings, *, dry_run: bool) -> List[ConversionResult]:
     if dry_run:
-        pdf_files = collect_pdf_listing(settings.pdf_input_dir)
-        if not pdf_files:
+        pdf_entries = scan_pdf_entries(settings.pdf_input_dir)
+        if not pdf_entries:
             logger.info("[dry-run] No PDF files found in %s", settings.pdf_input_dir)
             return []
 
+        existing_md = _list_directory_names(settings.md_output_dir)
         to_convert: List[Path] = []
-        for pdf in pdf_files:
+        for pdf_entry in pdf_entries:
+            pdf = Path(pdf_entry.path)
             md_path = settings.md_output_dir / f"{pdf.stem}.md"
-            if md_path.exists():
+            if md_path.name not in existing_md:
+                to_convert.append(pdf)
+            elif markdown_is_current(pdf_entry, md_path):
                 logger.info("[dry-run] Skipping %s; Markdown already exists at %s", pdf.name, md_path)
             else:
+                logger.info("[dry-run] %s is newer than %s; it would be reconverted", pdf.name, md_path)
                 to_convert.append(pdf)
 
         if not to_convert:
@@ -165,7 +366,12 @@ def execute_conversion(settings: Settings, *, dry_run: bool) -> List[ConversionR
             logger.info(" - %s", pdf)
         return []
 
-    return convert_pdfs_to_markdown(settings)
+    results = convert_pdfs_to_markdown(settings)
+    # Later runs reuse this Markdown; cache its counts so they are not re-tokenized.
+    for result in results:
+        _remember_counts(result.markdown_file, settings.token_counter_model, result.token_count, result.word_count)
+    _save_token_count_cache()
+    return results
 
 
 def summarize_processing(
@@ -178,31 +384,80 @@ def summarize_processing(
     if not (markdown_files or conversion_results or ai_results or chunk_plans):
         return
 
+    # The whole report is emitted at INFO; skip the file reads and tokenization otherwise.
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     logger.info("\n===== Diagnóstico de Processamento =====")
 
-    token_counter = TokenCount(model_name=settings.token_counter_model)
+    token_counter = get_token_counter(settings.token_counter_model)
+    existing_ai = _list_directory_names(settings.ai_output_dir)
     conversion_index: Dict[Path, ConversionResult] = {res.markdown_file: res for res in conversion_results}
     plan_index: Dict[Path, ChunkPlan] = {plan.document: plan for plan in (chunk_plans or [])}
-    ai_by_doc: Dict[Path, Dict[str, List[AIResult]]] = defaultdict(lambda: defaultdict(list))
-    for result in ai_results:
-        key = result.chunk_id or "document"
-        ai_by_doc[result.markdown_file][key].append(result)
+    results_by_key: Dict[Tuple[Path, str, str], AIResult] = {
+        (res.markdown_file, res.chunk_id or "document", res.prompt_label): res
+        for res in ai_results
+        if res.prompt_label
+    }
 
     prompt_entries = settings.get_user_prompt_entries(None)
     multi_prompt_mode = len(prompt_entries) > 1 or any(
-        entry.get("display") not in {"default", "inline-override"} for entry in prompt_entries
+        entry.get("display") not in DEFAULT_PROMPT_DISPLAYS for entry in prompt_entries
     )
+    prompt_meta: List[Tuple[str, str]] = []
+    for idx, entry in enumerate(prompt_entries, start=1):
+        label = str(entry.get("label", f"part{idx}"))
+        display = entry.get("display", label)
+        prompt_meta.append((label, f"     · Prompt {display} ({label}):"))
 
     all_docs = (
         set(markdown_files)
         | set(conversion_index.keys())
-        | set(ai_by_doc.keys())
+        | {res.markdown_file for res in ai_results}
         | set(plan_index.keys())
     )
     if not all_docs:
         return
 
-    for md_path in sorted(all_docs, key=lambda p: p.name.lower()):
+    sorted_docs = sorted(all_docs, key=lambda p: p.name.casefold())
+
+    # Gather every file whose counts must be read from disk and count them concurrently
+    # so the logging loop below only performs lookups.
+    fallback_paths: List[Path] = []
+    for md_path in sorted_docs:
+        if md_path not in conversion_index and md_path.exists():
+            fallback_paths.append(md_path)
+
+        plan = plan_index.get(md_path)
+        if plan:
+            for chunk in plan.chunks:
+                chunk_suffix = "" if len(plan.chunks) == 1 else f"_{chunk.chunk_id}"
+                chunk_merge_path = settings.ai_output_dir / f"{md_path.stem}{chunk_suffix}_ai.md"
+                merged_result = results_by_key.get((md_path, chunk.chunk_id, f"{chunk.chunk_id}-merged"))
+                if (merged_result is None or merged_result.token_count is None) and (
+                    chunk_merge_path.name in existing_ai
+                ):
+                    fallback_paths.append(chunk_merge_path)
+
+        global_merge_path = settings.ai_output_dir / f"{md_path.stem}_ai.md"
+        merged_global = results_by_key.get((md_path, "global", "merged"))
+        if (merged_global is None or merged_global.token_count is None) and (
+            global_merge_path.name in existing_ai
+        ):
+            fallback_paths.append(global_merge_path)
+
+    fallback_counts: Dict[Path, Tuple[int | None, int]] = {}
+    if fallback_paths:
+        unique_paths = list(dict.fromkeys(fallback_paths))
+        _load_token_count_cache()
+        with ThreadPoolExecutor(max_workers=min(SUMMARY_IO_WORKERS, len(unique_paths))) as executor:
+            counts = executor.map(
+                lambda path: _count_cached(path, token_counter, settings.token_counter_model),
+                unique_paths,
+            )
+            fallback_counts = dict(zip(unique_paths, counts))
+
+    for md_path in sorted_docs:
         logger.info("\nDocumento: %s", md_path.name)
         step = 1
 
@@ -219,9 +474,7 @@ def summarize_processing(
             step += 1
         else:
             if md_path.exists():
-                text = md_path.read_text(encoding="utf-8")
-                tokens = token_counter.num_tokens_from_string(text)
-                words = len(text.split())
+                tokens, words = fallback_counts[md_path]
                 logger.info("%s. Tempo Docling: não executado nesta execução (Markdown reutilizado)", step)
                 step += 1
                 logger.info(
@@ -238,7 +491,6 @@ def summarize_processing(
                 step += 1
 
         plan = plan_index.get(md_path)
-        chunk_store = ai_by_doc.get(md_path, {})
 
         if plan:
             logger.info(
@@ -264,17 +516,8 @@ def summarize_processing(
                     chunk.end_line,
                 )
 
-                chunk_results = {
-                    res.prompt_label: res
-                    for res in chunk_store.get(chunk.chunk_id, [])
-                    if res.prompt_label
-                }
-
-                for idx, entry in enumerate(prompt_entries, start=1):
-                    label = str(entry.get("label", f"part{idx}"))
-                    display = entry.get("display", label)
-                    prefix = f"     · Prompt {display} ({label}):"
-                    result = chunk_results.get(label)
+                for label, prefix in prompt_meta:
+                    result = results_by_key.get((md_path, chunk.chunk_id, label))
 
                     if result and result.duration_seconds is not None:
                         logger.info(
@@ -286,17 +529,17 @@ def summarize_processing(
                         continue
 
                     if multi_prompt_mode:
-                        output_path = settings.ai_output_dir / f"{base_filename}_{label}.md"
+                        output_name = f"{base_filename}_{label}.md"
                     else:
-                        output_path = settings.ai_output_dir / f"{base_filename}.md"
+                        output_name = f"{base_filename}.md"
 
-                    if output_path.exists():
-                        logger.info("%s já existente (%s)", prefix, output_path.name)
+                    if output_name in existing_ai:
+                        logger.info("%s já existente (%s)", prefix, output_name)
                     else:
                         logger.info("%s não executado", prefix)
 
                 merged_key = f"{chunk.chunk_id}-merged"
-                merged_result = chunk_results.get(merged_key)
+                merged_result = results_by_key.get((md_path, chunk.chunk_id, merged_key))
                 chunk_merge_path = settings.ai_output_dir / f"{base_filename}.md"
 
                 if merged_result and merged_result.token_count is not None:
@@ -306,10 +549,8 @@ def summarize_processing(
                         merged_result.word_count,
                         merged_result.output_file.name,
                     )
-                elif chunk_merge_path.exists():
-                    text = chunk_merge_path.read_text(encoding="utf-8")
-                    tokens = token_counter.num_tokens_from_string(text)
-                    words = len(text.split())
+                elif chunk_merge_path.name in existing_ai:
+                    tokens, words = fallback_counts[chunk_merge_path]
                     logger.info(
                         "     · Chunk combinado: %s tokens | %s palavras (pré-existente)",
                         tokens,
@@ -318,14 +559,9 @@ def summarize_processing(
                 else:
                     logger.info("     · Chunk combinado: não gerado")
 
-        global_results = {
-            res.prompt_label: res
-            for res in chunk_store.get("global", [])
-            if res.prompt_label
-        }
         global_merge_path = settings.ai_output_dir / f"{md_path.stem}_ai.md"
 
-        merged_global = global_results.get("merged")
+        merged_global = results_by_key.get((md_path, "global", "merged"))
         if merged_global and merged_global.token_count is not None:
             logger.info(
                 "%s. Markdown concatenado: %s tokens | %s palavras (%s)",
@@ -334,10 +570,8 @@ def summarize_processing(
                 merged_global.word_count,
                 merged_global.output_file.name,
             )
-        elif global_merge_path.exists():
-            text = global_merge_path.read_text(encoding="utf-8")
-            tokens = token_counter.num_tokens_from_string(text)
-            words = len(text.split())
+        elif global_merge_path.name in existing_ai:
+            tokens, words = fallback_counts[global_merge_path]
             logger.info(
                 "%s. Markdown concatenado: %s tokens | %s palavras (pré-existente)",
                 step,
@@ -347,8 +581,7 @@ def summarize_processing(
         else:
             logger.info("%s. Markdown concatenado: não gerado", step)
 
-def collect_pdf_listing(pdf_dir: Path) -> List[Path]:
-    return sorted(path for path in pdf_dir.glob("*.pdf") if path.is_file())
+    _save_token_count_cache()
 
 
 def execute_ai_stage(
@@ -363,24 +596,15 @@ def execute_ai_stage(
 
     settings.ensure_directories(include_ai=True)
     prompt_entries = settings.get_user_prompt_entries(None)
-    tokenizer = TokenCount(model_name=settings.token_counter_model)
-
-    chunk_plans: List[ChunkPlan] = []
+    documents: List[tuple[Path, str]] = []
     for md_file in markdown_files:
         try:
-            markdown_text = md_file.read_text(encoding="utf-8")
+            documents.append((md_file, _read_markdown(md_file, md_file.stat())))
         except OSError as exc:
             logger.error("Failed to read %s: %s", md_file, exc)
-            continue
 
-        plan = build_chunk_plan(
-            document=md_file,
-            markdown_text=markdown_text,
-            settings=settings,
-            tokenizer=tokenizer,
-            prompt_entries=prompt_entries,
-        )
-        chunk_plans.append(plan)
+    chunk_plans = build_chunk_plans_parallel(documents, settings=settings, prompt_entries=prompt_entries)
+    for plan in chunk_plans:
         save_chunk_plan(plan, settings=settings, parts=max(1, len(prompt_entries)))
 
     if dry_run:
@@ -450,6 +674,15 @@ def execute_ai_stage(
 
 
 def main() -> None:
+    # Load the tokenizer encoding in the background while arguments and settings are parsed.
+    # Only the default model name is needed, so no throwaway Settings() is built for it.
+    warmup = threading.Thread(
+        target=get_token_counter,
+        args=(DEFAULT_TOKEN_COUNTER_MODEL,),
+        daemon=True,
+    )
+    warmup.start()
+
     args = parse_args()
     logging.basicConfig(
         level=getattr(logging, args.log_level.upper(), logging.INFO),
@@ -458,6 +691,9 @@ def main() -> None:
 
     settings = Settings()
     apply_overrides(settings, args)
+    # Finish before any process pool forks: a child must not inherit tiktoken's import
+    # lock or a half-filled tokenizer cache from a load still in flight.
+    warmup.join()
 
     markdown_files: List[Path] = []
     conversion_results: List[ConversionResult] = []
@@ -1,19 +1,68 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import functools
+import hashlib
+import importlib.util
+import json
 import logging
+import os
+import random
+import sqlite3
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Sequence
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
 
-from openai import OpenAI
-from token_count import TokenCount
+import httpx
+import openai
+import tiktoken
+from openai import AsyncOpenAI
 
-from .config import Settings
-from .chunking import ChunkPlan
+try:
+    import aiofiles  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    aiofiles = None
+
+from .config import DEFAULT_PROMPT_DISPLAYS, Settings, ensure_directory, render_prompt
+from .chunking import ChunkPlan, MarkdownChunk, count_words
 
 logger = logging.getLogger(__name__)
 
+_BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+_BATCH_MAX_POLL_SECONDS = 600.0
+
+_T = TypeVar("_T")
+
+# HTTP/2 multiplexes the concurrent requests over fewer connections; httpx needs ``h2`` for it.
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_shared_clients: List[AsyncOpenAI] = []
+# Shared I/O pool for the response bookkeeping and the worker count it was built with.
+_io_executor: ThreadPoolExecutor | None = None
+_io_executor_workers = 0
+
+# Rate limits, timeouts and server errors are worth another attempt; anything else is final.
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+_RETRY_MIN_SECONDS = 1.0
+_RETRY_MAX_SECONDS = 30.0
+
+_RESPONSE_CACHE_FILENAME = ".ai_cache.sqlite"
+_MERGE_INDEX_FILENAME = ".merge_index.json"
+
+_INPUT_BATCH_INSTRUCTION = (
+    "Você receberá vários documentos, cada um delimitado por <doc name=\"...\"> e </doc>. "
+    "Processe cada documento de forma independente seguindo as instruções e responda APENAS "
+    "com um objeto JSON que mapeie o nome de cada documento (atributo name) para o Markdown "
+    "gerado para ele."
+)
+
 
 @dataclass
 class AIResult:
@@ -27,8 +76,598 @@ class AIResult:
     chunk_id: Optional[str] = None
 
 
-def _build_prompt(template: str, *, document_name: str, markdown_content: str) -> str:
-    return template.format(document_name=document_name, markdown_content=markdown_content)
+@functools.lru_cache(maxsize=4)
+def _get_encoding(model_name: str) -> tiktoken.Encoding:
+    """Return the tiktoken encoding for ``model_name``, loading its BPE ranks once per process."""
+
+    return tiktoken.encoding_for_model(model_name)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the loop every AI run executes on, so pooled connections outlive a single run."""
+
+    loop = asyncio.new_event_loop()
+    atexit.register(_close_event_loop, loop)
+    return loop
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str, max_concurrency: int) -> AsyncOpenAI:
+    """Return a shared client whose connection pool covers ``max_concurrency`` requests.
+
+    Retries are handled by ``_with_retries``, so the client's own retry loop is disabled.
+    """
+
+    http_client = httpx.AsyncClient(
+        http2=_HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_keepalive_connections=max_concurrency, max_connections=max_concurrency * 2),
+        timeout=httpx.Timeout(600.0, connect=10.0),
+    )
+    client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+    _shared_clients.append(client)
+    return client
+
+
+def _get_io_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Return the shared I/O pool, replacing it when ``max_workers`` changes.
+
+    The replaced pool is shut down so its threads exit once their queued work is done.
+    """
+
+    global _io_executor, _io_executor_workers
+    if _io_executor is None or _io_executor_workers != max_workers:
+        if _io_executor is not None:
+            _io_executor.shutdown(wait=False)
+        _io_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-io")
+        _io_executor_workers = max_workers
+    return _io_executor
+
+
+def _close_event_loop(loop: asyncio.AbstractEventLoop) -> None:
+    for client in _shared_clients:
+        loop.run_until_complete(client.close())
+    _shared_clients.clear()
+    loop.run_until_complete(loop.shutdown_default_executor())
+    loop.close()
+
+
+@dataclass
+class _PromptJob:
+    """A single (document, chunk, prompt entry) request waiting to be sent.
+
+    Jobs only reference the chunk and the shared prompt template; the chunk Markdown and
+    the user prompt are built when the request is sent, so a run never holds every
+    rendered prompt of the corpus at once.
+    """
+
+    doc_path: Path
+    chunk: MarkdownChunk
+    total_chunks: int
+    label: str
+    display: str
+    template: str
+    output_path: Path
+    # Markdown tokens when the whole document fits one chunk (eligible for input batching).
+    batch_tokens: int | None = None
+
+    @property
+    def chunk_id(self) -> str:
+        return self.chunk.chunk_id
+
+    def markdown_content(self) -> str:
+        """Chunk text preceded by a header locating it in the document."""
+
+        chunk = self.chunk
+        heading_summary = ", ".join(chunk.headings[:4]) or "sem títulos"
+        chunk_header = (
+            f"Chunk {chunk.index}/{self.total_chunks} do documento {self.doc_path.name}. "
+            f"Linhas {chunk.start_line}-{chunk.end_line}. Seções: {heading_summary}."
+        )
+        return f"{chunk_header}\n\n{chunk.text}".strip()
+
+    def render_user_prompt(self) -> str:
+        return render_prompt(
+            self.template,
+            document_name=f"{self.doc_path.stem} ({self.chunk_id})",
+            markdown_content=self.markdown_content(),
+        )
+
+
+def _response_input(system_prompt: str, user_prompt: str) -> List[dict[str, object]]:
+    return [
+        {
+            "role": "system",
+            "content": [
+                {"type": "input_text", "text": system_prompt},
+            ],
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "input_text", "text": user_prompt},
+            ],
+        },
+    ]
+
+
+async def _write_text(path: Path, text: str) -> None:
+    """Write ``text`` without blocking the event loop, so other requests keep flowing."""
+
+    if aiofiles is not None:
+        async with aiofiles.open(path, "w", encoding="utf-8") as handle:
+            await handle.write(text)
+    else:
+        await asyncio.to_thread(path.write_text, text, encoding="utf-8")
+
+
+def _build_result(
+    job: _PromptJob,
+    output_text: str,
+    *,
+    start_time: float,
+    token_encoding: tiktoken.Encoding,
+    word_count: int | None = None,
+) -> AIResult:
+    duration = time.perf_counter() - start_time
+    return AIResult(
+        markdown_file=job.doc_path,
+        output_file=job.output_path,
+        response_text=output_text,
+        prompt_label=job.label,
+        duration_seconds=duration,
+        token_count=len(token_encoding.encode_ordinary(output_text)),
+        word_count=count_words(output_text) if word_count is None else word_count,
+        chunk_id=job.chunk_id,
+    )
+
+
+async def _store_response(
+    job: _PromptJob,
+    output_text: str,
+    *,
+    start_time: float,
+    token_encoding: tiktoken.Encoding,
+) -> AIResult:
+    await _write_text(job.output_path, output_text)
+    logger.info("Saved AI response to %s", job.output_path)
+    return await asyncio.to_thread(
+        _build_result,
+        job,
+        output_text,
+        start_time=start_time,
+        token_encoding=token_encoding,
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _response_key_prefix(model: str, system_prompt: str) -> hashlib.blake2b:
+    return hashlib.blake2b(f"{model}\x00{system_prompt}\x00".encode("utf-8"), digest_size=16)
+
+
+class _ResponseCache:
+    """SQLite store of previous responses keyed by a hash of model and prompts."""
+
+    def __init__(self, path: Path) -> None:
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, output_text TEXT, created REAL)"
+        )
+
+    @staticmethod
+    def key(model: str, system_prompt: str, user_prompt: str) -> str:
+        # Same digest as hashing "model\0system\0user" in one go, but the shared prefix is
+        # encoded and hashed once per run rather than copied into every key's payload.
+        digest = _response_key_prefix(model, system_prompt).copy()
+        digest.update(user_prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        row = self._connection.execute("SELECT output_text FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, items: Sequence[tuple[str, str]]) -> None:
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO responses (key, output_text, created) VALUES (?, ?, ?)",
+                [(key, text, now) for key, text in items],
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+async def _with_retries(
+    operation: Callable[[], Awaitable[_T]],
+    *,
+    settings: Settings,
+    description: str,
+) -> _T:
+    """Await ``operation()``, retrying transient OpenAI errors with jittered exponential backoff."""
+
+    attempt = 1
+    while True:
+        try:
+            return await operation()
+        except _RETRYABLE_ERRORS as exc:
+            if attempt >= settings.ai_max_retries:
+                raise
+            delay = random.uniform(_RETRY_MIN_SECONDS, min(_RETRY_MAX_SECONDS, _RETRY_MIN_SECONDS * 2**attempt))
+            logger.warning(
+                "Transient OpenAI error for %s (%s); retrying in %.1fs (attempt %s/%s)",
+                description,
+                exc,
+                delay,
+                attempt + 1,
+                settings.ai_max_retries,
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def _stream_response(
+    client: AsyncOpenAI,
+    job: _PromptJob,
+    *,
+    settings: Settings,
+    system_prompt: str,
+    user_prompt: str,
+) -> tuple[str, int]:
+    """Stream one response and return its text and word count."""
+
+    pieces: List[str] = []
+    words = 0
+    in_word = False
+    async with client.responses.stream(
+        model=settings.openai_model,
+        input=_response_input(system_prompt, user_prompt),
+    ) as stream:
+        async for event in stream:
+            if event.type != "response.output_text.delta" or not event.delta:
+                continue
+            delta = event.delta
+            pieces.append(delta)
+            words += count_words(delta)
+            if in_word and not delta[0].isspace():
+                words -= 1  # the delta continues the previous word
+            in_word = not delta[-1].isspace()
+    # Deltas are buffered and joined once; no file I/O happens on the event loop here.
+    return "".join(pieces), words
+
+
+async def _run_prompt_job(
+    client: AsyncOpenAI,
+    job: _PromptJob,
+    *,
+    settings: Settings,
+    system_prompt: str,
+    semaphore: asyncio.Semaphore,
+    token_encoding: tiktoken.Encoding,
+) -> AIResult | None:
+    start_time = time.perf_counter()
+    async with semaphore:
+        logger.info(
+            "Requesting completion for %s (%s - %s)",
+            job.doc_path.name,
+            job.chunk_id,
+            job.display,
+        )
+        # The finished text is written to a partial file off the event loop and only
+        # renamed into place afterwards, so an interrupted write never looks like a
+        # finished output to ``--skip-existing-ai``.
+        partial_path = job.output_path.with_name(job.output_path.name + ".partial")
+        # Rendered once per job, right before sending, and shared by every retry.
+        user_prompt = job.render_user_prompt()
+        try:
+            output_text, words = await _with_retries(
+                lambda: _stream_response(
+                    client,
+                    job,
+                    settings=settings,
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                ),
+                settings=settings,
+                description=f"{job.doc_path.name} ({job.chunk_id} - {job.display})",
+            )
+            await _write_text(partial_path, output_text)
+            await asyncio.to_thread(os.replace, partial_path, job.output_path)
+        except Exception as exc:  # noqa: BLE001
+            partial_path.unlink(missing_ok=True)
+            logger.exception(
+                "OpenAI request failed for %s (%s - %s): %s",
+                job.doc_path.name,
+                job.chunk_id,
+                job.display,
+                exc,
+            )
+            return None
+
+    logger.info("Saved AI response to %s", job.output_path)
+    return await asyncio.to_thread(
+        _build_result,
+        job,
+        output_text,
+        start_time=start_time,
+        token_encoding=token_encoding,
+        word_count=words,
+    )
+
+
+def _group_for_input_batching(jobs: Sequence[_PromptJob], token_budget: int) -> List[List[int]]:
+    """Greedily pack small single-chunk documents sharing a prompt into groups within ``token_budget``."""
+
+    groups: List[List[int]] = []
+    open_groups: dict[str, tuple[List[int], int]] = {}
+    for index, job in enumerate(jobs):
+        tokens = job.batch_tokens
+        if tokens is None or tokens > token_budget:
+            groups.append([index])
+            continue
+        current = open_groups.get(job.label)
+        if current and current[1] + tokens <= token_budget:
+            current[0].append(index)
+            open_groups[job.label] = (current[0], current[1] + tokens)
+        else:
+            group = [index]
+            groups.append(group)
+            open_groups[job.label] = (group, tokens)
+    return groups
+
+
+def _parse_batched_output(output_text: str) -> dict[str, str] | None:
+    text = output_text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return {str(name): str(markdown) for name, markdown in data.items()}
+
+
+async def _run_input_batch(
+    client: AsyncOpenAI,
+    group: Sequence[_PromptJob],
+    *,
+    settings: Settings,
+    system_prompt: str,
+    semaphore: asyncio.Semaphore,
+    token_encoding: tiktoken.Encoding,
+) -> List[AIResult | None]:
+    """Send several small documents in one request and split the JSON answer per document."""
+
+    names = [job.doc_path.stem for job in group]
+    blocks = "\n\n".join(
+        f'<doc name="{name}">\n{job.markdown_content()}\n</doc>' for name, job in zip(names, group)
+    )
+    user_prompt = render_prompt(
+        group[0].template,
+        document_name=", ".join(names),
+        markdown_content=blocks,
+    )
+
+    start_time = time.perf_counter()
+    outputs: dict[str, str] | None = None
+    async with semaphore:
+        logger.info(
+            "Requesting batched completion for %s document(s) (%s): %s",
+            len(group),
+            group[0].display,
+            ", ".join(names),
+        )
+        try:
+            response = await _with_retries(
+                lambda: client.responses.create(
+                    model=settings.openai_model,
+                    input=_response_input(f"{system_prompt}\n\n{_INPUT_BATCH_INSTRUCTION}", user_prompt),
+                ),
+                settings=settings,
+                description=", ".join(names),
+            )
+            outputs = _parse_batched_output(response.output_text)  # type: ignore[attr-defined]
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Batched OpenAI request failed for %s: %s", ", ".join(names), exc)
+
+    results: List[AIResult | None] = []
+    for name, job in zip(names, group):
+        output_text = outputs.get(name) if outputs else None
+        if output_text is None:
+            logger.warning(
+                "Batched response has no output for %s (%s); sending it on its own",
+                job.doc_path.name,
+                job.display,
+            )
+            results.append(
+                await _run_prompt_job(
+                    client,
+                    job,
+                    settings=settings,
+                    system_prompt=system_prompt,
+                    semaphore=semaphore,
+                    token_encoding=token_encoding,
+                )
+            )
+            continue
+        results.append(
+            await _store_response(
+                job,
+                output_text,
+                start_time=start_time,
+                token_encoding=token_encoding,
+            )
+        )
+    return results
+
+
+async def _run_prompt_jobs(
+    jobs: Sequence[_PromptJob],
+    *,
+    settings: Settings,
+    system_prompt: str,
+    token_encoding: tiktoken.Encoding,
+) -> List[AIResult | None]:
+    """Send every job concurrently, with at most ``settings.ai_max_concurrency`` in flight."""
+
+    if settings.enable_input_batching:
+        groups = _group_for_input_batching(jobs, settings.batch_input_token_budget)
+    else:
+        groups = [[index] for index in range(len(jobs))]
+
+    # File writes and token counting run on worker threads sized like the request
+    # limit, so finished responses never stall the streams still in flight.
+    asyncio.get_running_loop().set_default_executor(_get_io_executor(settings.ai_max_concurrency))
+    semaphore = asyncio.Semaphore(settings.ai_max_concurrency)
+    client = _get_client(settings.get_openai_api_key(), settings.ai_max_concurrency)
+
+    async def run_group(indices: List[int]) -> List[AIResult | None]:
+        options = dict(
+            settings=settings,
+            system_prompt=system_prompt,
+            semaphore=semaphore,
+            token_encoding=token_encoding,
+        )
+        if len(indices) == 1:
+            return [await _run_prompt_job(client, jobs[indices[0]], **options)]
+        return await _run_input_batch(client, [jobs[index] for index in indices], **options)
+
+    outcomes = await asyncio.gather(
+        *(run_group(indices) for indices in groups),
+        return_exceptions=True,
+    )
+
+    results: List[AIResult | None] = [None] * len(jobs)
+    for indices, outcome in zip(groups, outcomes):
+        if isinstance(outcome, BaseException):
+            for index in indices:
+                job = jobs[index]
+                logger.error(
+                    "Failed to store response for %s (%s - %s): %s",
+                    job.doc_path.name,
+                    job.chunk_id,
+                    job.display,
+                    outcome,
+                )
+            continue
+        for index, result in zip(indices, outcome):
+            results[index] = result
+    return results
+
+
+def _output_text_from_body(body: dict) -> str:
+    """Concatenate the ``output_text`` parts of a raw Responses API payload."""
+
+    return "".join(
+        str(part.get("text", ""))
+        for item in body.get("output", [])
+        if item.get("type") == "message"
+        for part in item.get("content", [])
+        if part.get("type") == "output_text"
+    )
+
+
+async def _run_batch_jobs(
+    jobs: Sequence[_PromptJob],
+    *,
+    settings: Settings,
+    system_prompt: str,
+    token_encoding: tiktoken.Encoding,
+) -> List[AIResult | None]:
+    """Submit every job as one OpenAI Batch API request and store the answers when it completes."""
+
+    start_time = time.perf_counter()
+    custom_ids = [f"{job.doc_path.stem}:{job.chunk_id}:{job.label}" for job in jobs]
+    payload = "".join(
+        json.dumps(
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {
+                    "model": settings.openai_model,
+                    "input": _response_input(system_prompt, job.render_user_prompt()),
+                },
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+        for custom_id, job in zip(custom_ids, jobs)
+    )
+
+    # Batch bookkeeping calls keep the SDK's own retries; only live requests use _with_retries.
+    client = _get_client(settings.get_openai_api_key(), settings.ai_max_concurrency).with_options(max_retries=2)
+    try:
+        batch_file = await client.files.create(
+            file=("requests.jsonl", payload.encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/responses",
+            completion_window="24h",
+        )
+        logger.info("Submitted OpenAI batch %s with %s request(s)", batch.id, len(jobs))
+
+        delay = settings.batch_poll_seconds
+        while batch.status not in _BATCH_TERMINAL_STATUSES:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _BATCH_MAX_POLL_SECONDS)
+            batch = await client.batches.retrieve(batch.id)
+            logger.debug("Batch %s status: %s", batch.id, batch.status)
+
+        if batch.status != "completed" or not batch.output_file_id:
+            logger.error("OpenAI batch %s finished with status %s", batch.id, batch.status)
+            return [None] * len(jobs)
+
+        content = await client.files.content(batch.output_file_id)
+    except Exception as exc:  # noqa: BLE001 - the jobs fail like individual requests do
+        logger.exception("OpenAI batch with %s request(s) failed: %s", len(jobs), exc)
+        return [None] * len(jobs)
+
+    output_by_id: dict[str, str] = {}
+    for line in content.text.splitlines():
+        if not line.strip():
+            continue
+        # A bad record only loses its own job, which is reported below as missing output.
+        try:
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                logger.error(
+                    "OpenAI batch request %s failed: %s",
+                    record.get("custom_id"),
+                    record.get("error") or response.get("body"),
+                )
+                continue
+            output_by_id[record["custom_id"]] = _output_text_from_body(response.get("body") or {})
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            logger.error("Skipping malformed OpenAI batch output line %r: %s", line[:200], exc)
+
+    results: List[AIResult | None] = []
+    for custom_id, job in zip(custom_ids, jobs):
+        output_text = output_by_id.get(custom_id)
+        if output_text is None:
+            logger.error(
+                "No batch output for %s (%s - %s)",
+                job.doc_path.name,
+                job.chunk_id,
+                job.display,
+            )
+            results.append(None)
+            continue
+        results.append(
+            await _store_response(
+                job,
+                output_text,
+                start_time=start_time,
+                token_encoding=token_encoding,
+            )
+        )
+    return results
 
 
 def run_ai_pipeline(
@@ -40,13 +679,17 @@ def run_ai_pipeline(
     user_prompt_template: str | None = None,
     overwrite: bool = False,
 ) -> List[AIResult]:
-    """Execute the AI stage given precomputed chunk plans."""
+    """Execute the AI stage given precomputed chunk plans.
+
+    Requests for every document, chunk and prompt are sent concurrently; the per-chunk
+    and per-document merges run afterwards, in plan order.
+    """
 
     if not chunk_plans:
         logger.warning("No chunk plans provided for AI processing.")
         return []
 
-    if not settings.openai_api_key:
+    if not settings.get_openai_api_key():
         raise RuntimeError(
             "OPENAI_API_KEY is not set. Export it as an environment variable "
             "or provide it before running the AI stage."
@@ -60,14 +703,35 @@ def run_ai_pipeline(
         logger.error("No user prompt templates available; aborting AI stage.")
         return []
 
-    settings.ai_output_dir.mkdir(parents=True, exist_ok=True)
+    ensure_directory(settings.ai_output_dir)
+    # One listing of the output directory answers every existence check below.
+    with os.scandir(settings.ai_output_dir) as entries:
+        existing = {entry.name for entry in entries}
 
-    client = OpenAI(api_key=settings.openai_api_key)
-    token_counter = TokenCount(model_name=settings.token_counter_model)
-    results: List[AIResult] = []
+    token_encoding = _get_encoding(settings.token_counter_model)
     multi_prompt_mode = len(prompt_entries) > 1 or any(
-        entry.get("display") not in {"default", "inline-override"} for entry in prompt_entries
+        entry.get("display") not in DEFAULT_PROMPT_DISPLAYS for entry in prompt_entries
     )
+
+    # Per-entry values are fixed for the whole run: (label, display, template, filename suffix).
+    entry_specs: List[tuple[str, str, str, str]] = []
+    for entry in prompt_entries:
+        label = str(entry.get("label", "part1"))
+        entry_specs.append(
+            (
+                label,
+                str(entry.get("display", label)),
+                str(entry.get("prompt", settings.user_prompt_template)),
+                f"_{label}.md" if multi_prompt_mode else ".md",
+            )
+        )
+    ai_dir = settings.ai_output_dir
+    ai_dir_str = str(ai_dir)
+
+    # chunk layouts per document: (plan, [(chunk, base_filename, part_filenames, jobs)])
+    documents: List[tuple[ChunkPlan, List[tuple[MarkdownChunk, str, List[str], List[_PromptJob]]]]] = []
+    jobs: List[_PromptJob] = []
+
     for plan in chunk_plans:
         doc_path = plan.document
         if not doc_path.exists():
@@ -86,121 +750,164 @@ def run_ai_pipeline(
             settings.openai_model,
         )
 
-        chunk_merge_paths: List[Path] = []
+        chunk_layouts: List[tuple[MarkdownChunk, str, List[str], List[_PromptJob]]] = []
 
         for chunk in plan.chunks:
             chunk_suffix = "" if total_chunks == 1 else f"_{chunk.chunk_id}"
             base_filename = f"{doc_path.stem}{chunk_suffix}_ai"
 
-            heading_summary = ", ".join(chunk.headings[:4]) or "sem títulos"
-            chunk_header = (
-                f"Chunk {chunk.index}/{total_chunks} do documento {doc_path.name}. "
-                f"Linhas {chunk.start_line}-{chunk.end_line}. Seções: {heading_summary}."
-            )
-            chunk_markdown_content = f"{chunk_header}\n\n{chunk.text}".strip()
+            # Outputs are tracked by file name; Path objects are only built for requests.
+            part_filenames: List[str] = []
+            chunk_jobs: List[_PromptJob] = []
 
-            part_outputs: List[tuple[dict[str, object], Path]] = []
-            pending_entries: List[tuple[dict[str, object], Path]] = []
+            for label, display, template, filename_suffix in entry_specs:
+                output_filename = base_filename + filename_suffix
+                part_filenames.append(output_filename)
 
-            for entry in prompt_entries:
-                label = str(entry.get("label", "part1"))
-                if multi_prompt_mode:
-                    output_filename = f"{base_filename}_{label}.md"
-                else:
-                    output_filename = f"{base_filename}.md"
-
-                output_path = settings.ai_output_dir / output_filename
-                part_outputs.append((entry, output_path))
-
-                if output_path.exists() and not overwrite:
+                if output_filename in existing and not overwrite:
                     logger.info(
                         "Skipping %s (%s - %s) because output already exists",
                         doc_path.name,
                         chunk.chunk_id,
-                        entry.get("display", label),
+                        display,
                     )
-                else:
-                    pending_entries.append((entry, output_path))
-
-            part_results: List[AIResult] = []
+                    continue
 
-            for entry, output_path in pending_entries:
-                label = str(entry.get("label", "part1"))
-                logger.info(
-                    "Requesting completion for %s (%s - %s)",
-                    doc_path.name,
-                    chunk.chunk_id,
-                    entry.get("display", label),
+                chunk_jobs.append(
+                    _PromptJob(
+                        doc_path=doc_path,
+                        chunk=chunk,
+                        total_chunks=total_chunks,
+                        label=label,
+                        display=display,
+                        template=template,
+                        output_path=ai_dir / output_filename,
+                        batch_tokens=chunk.token_count if total_chunks == 1 else None,
+                    )
                 )
 
-                user_prompt = _build_prompt(
-                    str(entry.get("prompt", settings.user_prompt_template)),
-                    document_name=f"{doc_path.stem} ({chunk.chunk_id})",
-                    markdown_content=chunk_markdown_content,
-                )
+            jobs.extend(chunk_jobs)
+            chunk_layouts.append((chunk, base_filename, part_filenames, chunk_jobs))
 
-                start_time = time.perf_counter()
-                try:
-                    response = client.responses.create(
-                        model=settings.openai_model,
-                        input=[
-                            {
-                                "role": "system",
-                                "content": [
-                                    {"type": "input_text", "text": system_prompt},
-                                ],
-                            },
-                            {
-                                "role": "user",
-                                "content": [
-                                    {"type": "input_text", "text": user_prompt},
-                                ],
-                            },
-                        ],
-                    )
-                except Exception as exc:  # noqa: BLE001
-                    logger.exception(
-                        "OpenAI request failed for %s (%s - %s): %s",
-                        doc_path.name,
-                        chunk.chunk_id,
-                        entry.get("display", label),
-                        exc,
-                    )
-                    continue
+        documents.append((plan, chunk_layouts))
 
-                output_text = response.output_text  # type: ignore[attr-defined]
-                output_path.write_text(output_text, encoding="utf-8")
-                duration = time.perf_counter() - start_time
-                tokens = token_counter.num_tokens_from_string(output_text)
-                words = len(output_text.split())
-                logger.info("Saved AI response to %s", output_path)
+    outcomes: List[AIResult | None] = [None] * len(jobs)
+    cache = _ResponseCache(settings.ai_output_dir / _RESPONSE_CACHE_FILENAME) if settings.enable_response_cache else None
+    cache_keys: List[str] = []
+    missing: List[int] = list(range(len(jobs)))
+    if cache is not None:
+        # Byte-identical prompts answered before are written straight from the cache.
+        missing = []
+        for index, job in enumerate(jobs):
+            start_time = time.perf_counter()
+            key = _ResponseCache.key(settings.openai_model, system_prompt, job.render_user_prompt())
+            cache_keys.append(key)
+            cached_text = cache.get(key)
+            if cached_text is None:
+                missing.append(index)
+                continue
+            job.output_path.write_text(cached_text, encoding="utf-8")
+            logger.info("Saved cached AI response to %s", job.output_path)
+            outcomes[index] = _build_result(job, cached_text, start_time=start_time, token_encoding=token_encoding)
 
-                result = AIResult(
-                    markdown_file=doc_path,
-                    output_file=output_path,
-                    response_text=output_text,
-                    prompt_label=label,
-                    duration_seconds=duration,
-                    token_count=tokens,
-                    word_count=words,
-                    chunk_id=chunk.chunk_id,
+    try:
+        if missing:
+            # Large jobs can trade latency for cost through the Batch API (24h completion window).
+            use_batch = settings.use_batch_api and len(missing) >= settings.batch_threshold
+            runner = _run_batch_jobs if use_batch else _run_prompt_jobs
+            fresh = _get_event_loop().run_until_complete(
+                runner(
+                    [jobs[index] for index in missing],
+                    settings=settings,
+                    system_prompt=system_prompt,
+                    token_encoding=token_encoding,
+                )
+            )
+            for index, result in zip(missing, fresh):
+                outcomes[index] = result
+            if cache is not None:
+                cache.put_many(
+                    [(cache_keys[index], result.response_text) for index, result in zip(missing, fresh) if result is not None]
                 )
-                results.append(result)
-                part_results.append(result)
+    finally:
+        if cache is not None:
+            cache.close()
+    # Outcomes follow the order in which jobs were queued, chunk by chunk.
+    pending_outcomes = iter(outcomes)
+
+    merge_index_path = ai_dir / _MERGE_INDEX_FILENAME
+    merge_index = _load_merge_index(merge_index_path)
+    # Files written during this run. In single-prompt mode a part shares its name with the
+    # chunk merge, so a freshly written part must never pass for an unchanged merge.
+    written: set[str] = set()
+    merge_index_changed = False
+
+    results: List[AIResult] = []
+    for plan, chunk_layouts in documents:
+        doc_path = plan.document
+        # Chunk merges are kept in memory for the document-level merge.
+        global_chunks: List[str] = []
+        global_tokens = 0
+        global_words = 0
+
+        for chunk, base_filename, part_filenames, chunk_jobs in chunk_layouts:
+            # Responses produced in this run are merged from memory with the counts
+            # already taken when they were stored.
+            part_cache: dict[str, AIResult] = {}
+            for _ in chunk_jobs:
+                result = next(pending_outcomes)
+                if result is not None:
+                    results.append(result)
+                    part_cache[result.output_file.name] = result
+                    existing.add(result.output_file.name)
+                    written.add(result.output_file.name)
 
             # Merge prompts for this chunk
-            chunk_merge_path = settings.ai_output_dir / f"{base_filename}.md"
+            chunk_merge_path = ai_dir / f"{base_filename}.md"
             merged_text_sources: List[str] = []
-            for _, output_path in part_outputs:
-                if output_path.exists():
-                    merged_text_sources.append(output_path.read_text(encoding="utf-8").strip())
-
-            merged_text = "\n\n".join(text for text in merged_text_sources if text)
-            chunk_merge_path.write_text((merged_text + "\n") if merged_text else "", encoding="utf-8")
-            logger.info("Saved chunk merged output to %s", chunk_merge_path)
+            reused_texts: List[str] = []
+            merged_tokens = 0
+            merged_words = 0
+            for output_filename in part_filenames:
+                cached = part_cache.get(output_filename)
+                if cached is not None:
+                    text = cached.response_text.strip()
+                    if text:
+                        merged_tokens += cached.token_count or 0
+                        merged_words += cached.word_count or 0
+                elif output_filename in existing:
+                    with open(f"{ai_dir_str}/{output_filename}", encoding="utf-8") as handle:
+                        text = handle.read().strip()
+                    if text:
+                        reused_texts.append(text)
+                else:
+                    continue
+                if text:
+                    merged_text_sources.append(text)
 
-            merged_tokens = token_counter.num_tokens_from_string(merged_text)
-            merged_words = len(merged_text.split()) if merged_text else 0
+            merged_text = "\n\n".join(merged_text_sources)
+            merge_digest = _merge_digest(merged_text_sources, settings.token_counter_model)
+            previous = merge_index.get(chunk_merge_path.name)
+            if _merge_unchanged(previous, merge_digest, chunk_merge_path.name, existing, written):
+                # Same parts as the last run: keep the file and its recorded counts.
+                merged_tokens, merged_words = previous["tokens"], previous["words"]
+                logger.info("Chunk merged output %s is unchanged", chunk_merge_path)
+            else:
+                if reused_texts:
+                    # Pre-existing parts are encoded together on tiktoken's native thread pool.
+                    merged_tokens += sum(
+                        len(ids)
+                        for ids in token_encoding.encode_ordinary_batch(reused_texts, num_threads=os.cpu_count() or 1)
+                    )
+                    merged_words += sum(count_words(text) for text in reused_texts)
+                _write_merge(chunk_merge_path, merged_text_sources)
+                existing.add(chunk_merge_path.name)
+                logger.info("Saved chunk merged output to %s", chunk_merge_path)
+                merge_index[chunk_merge_path.name] = {"digest": merge_digest, "tokens": merged_tokens, "words": merged_words}
+                written.add(chunk_merge_path.name)
+                merge_index_changed = True
+            global_tokens += merged_tokens
+            global_words += merged_words
 
             results.append(
                 AIResult(
@@ -215,26 +922,28 @@ def run_ai_pipeline(
                 )
             )
 
-            chunk_merge_paths.append(chunk_merge_path)
+            if merged_text:
+                global_chunks.append(merged_text)
 
         # merge all chunks into a single document-level file
-        if chunk_merge_paths:
-            global_merge_path = settings.ai_output_dir / f"{doc_path.stem}_ai.md"
-            global_chunks: List[str] = []
-            for chunk in plan.chunks:
-                chunk_suffix = "" if total_chunks == 1 else f"_{chunk.chunk_id}"
-                candidate_path = settings.ai_output_dir / f"{doc_path.stem}{chunk_suffix}_ai.md"
-                if candidate_path.exists():
-                    text = candidate_path.read_text(encoding="utf-8").strip()
-                    if text:
-                        global_chunks.append(text)
-
+        if chunk_layouts:
+            global_merge_path = ai_dir / f"{doc_path.stem}_ai.md"
             global_merged_text = "\n\n".join(global_chunks)
-            global_merge_path.write_text((global_merged_text + "\n") if global_merged_text else "", encoding="utf-8")
-            logger.info("Saved global merged output to %s", global_merge_path)
-
-            global_tokens = token_counter.num_tokens_from_string(global_merged_text)
-            global_words = len(global_merged_text.split()) if global_merged_text else 0
+            merge_digest = _merge_digest(global_chunks, settings.token_counter_model)
+            previous = merge_index.get(global_merge_path.name)
+            if len(chunk_layouts) == 1:
+                # A single chunk's merge is named {stem}_ai.md too and was already written above.
+                pass
+            elif _merge_unchanged(previous, merge_digest, global_merge_path.name, existing, written):
+                logger.info("Global merged output %s is unchanged", global_merge_path)
+            else:
+                # Streamed piece by piece: no second full-size copy for the trailing newline or encoding.
+                _write_merge(global_merge_path, global_chunks)
+                existing.add(global_merge_path.name)
+                logger.info("Saved global merged output to %s", global_merge_path)
+                merge_index[global_merge_path.name] = {"digest": merge_digest, "tokens": global_tokens, "words": global_words}
+                written.add(global_merge_path.name)
+                merge_index_changed = True
 
             results.append(
                 AIResult(
@@ -249,10 +958,80 @@ def run_ai_pipeline(
                 )
             )
 
+    if merge_index_changed:
+        _save_merge_index(merge_index_path, merge_index)
     return results
 
 
+def _merge_digest(pieces: Sequence[str], token_counter_model: str) -> str:
+    """Digest of the merge text (``pieces`` joined by blank lines) without building it."""
+
+    digest = hashlib.blake2b(f"{token_counter_model}\x00".encode("utf-8"), digest_size=16)
+    for index, piece in enumerate(pieces):
+        if index:
+            digest.update(b"\n\n")
+        digest.update(piece.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _write_merge(path: Path, pieces: Sequence[str]) -> None:
+    """Write ``pieces`` separated by blank lines straight to ``path``, newline-terminated."""
+
+    with path.open("w", encoding="utf-8") as handle:
+        for index, piece in enumerate(pieces):
+            if index:
+                handle.write("\n\n")
+            handle.write(piece)
+        if pieces:
+            handle.write("\n")
+
+
+def _merge_unchanged(
+    previous: dict | None,
+    digest: str,
+    filename: str,
+    existing: set[str],
+    written: set[str],
+) -> bool:
+    return (
+        previous is not None
+        and previous.get("digest") == digest
+        and filename in existing
+        and filename not in written
+    )
+
+
+def _load_merge_index(path: Path) -> dict[str, dict]:
+    """Return the digest and counts recorded for each merge file by earlier runs."""
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_merge_index(path: Path, index: dict[str, dict]) -> None:
+    try:
+        path.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+    except OSError as exc:
+        logger.warning("Could not save merge index %s: %s", path, exc)
+
+
 def collect_markdown_files(md_dir: Path) -> List[Path]:
     """Gather Markdown files sorted by name."""
 
-    return sorted(path for path in md_dir.glob("*.md") if path.is_file())
+    # One directory read; DirEntry.is_file() answers from it instead of a stat per entry.
+    try:
+        with os.scandir(md_dir) as entries:
+            markdown_files = [
+                Path(entry.path)
+                for entry in entries
+                # Exact suffix, as the old glob("*.md"): foo.md and foo.MD would share a stem and
+                # therefore every AI output name.
+                if entry.name.endswith(".md") and entry.is_file()
+            ]
+    except FileNotFoundError:
+        return []
+    markdown_files.sort()
+    return markdown_files
@@ -1,21 +1,148 @@
 from __future__ import annotations
 
+import bisect
+import functools
+import io
+import itertools
 import json
 import logging
 import math
+import os
 import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Iterable, List, Sequence
 
 from token_count import TokenCount
 
-from .config import Settings
+try:
+    import orjson  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from .config import Settings, ensure_directory
 
 logger = logging.getLogger(__name__)
 
 _heading_re = re.compile(r"^(#{1,6})\s+(.*)")
 _sentence_split_re = re.compile(r"(?<=[.!?])\s+(?=[A-ZÀ-ÖØ-Þ0-9])")
+_whitespace_re = re.compile(r"\s")
+# Line boundaries str.splitlines() honours besides "\n"; unwrapping a chunk turns them into "\n".
+_foreign_line_break_re = re.compile("[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# Texts longer than this are word-counted window by window.
+_WORD_COUNT_WINDOW_CHARS = 1 << 20
+
+# Token counts _CachedTokenizer keeps per plan; the least recently used ones are dropped.
+_TOKEN_COUNT_CACHE_SIZE = 4096
+
+# With chunking_workers=0 (automatic), plans are built in this process unless the batch is
+# big enough to pay for starting workers; under spawn each one re-imports docling/torch.
+_PARALLEL_PLAN_MIN_DOCUMENTS = 4
+_PARALLEL_PLAN_MIN_CHARS = 8 << 20
+
+
+@functools.lru_cache(maxsize=4)
+def get_token_counter(model_name: str) -> TokenCount:
+    """Return a shared ``TokenCount`` so the encoder is only loaded once per model."""
+
+    return TokenCount(model_name=model_name)
+
+
+@functools.lru_cache(maxsize=64)
+def _count_prompt_tokens(tokenizer: TokenCount, prompt: str) -> int:
+    """Token count of a prompt; prompts are shared by every document of a run."""
+
+    return tokenizer.num_tokens_from_string(prompt)
+
+
+class _CachedTokenizer:
+    """``TokenCount`` stand-in that remembers the counts of strings it has already seen.
+
+    A plan tokenizes the same text several times (blocks, chunk bodies, then again in
+    ``order_fix``), so repeated counts are answered from an LRU cache of
+    ``_TOKEN_COUNT_CACHE_SIZE`` entries. ``count_many`` encodes all unseen strings in one
+    tiktoken batch call.
+    """
+
+    __slots__ = ("tokenizer", "_encoding", "_counts")
+
+    def __init__(self, tokenizer: TokenCount) -> None:
+        self.tokenizer = tokenizer
+        # token_count keeps its tiktoken encoding on ``encoding``; batches go straight to it.
+        self._encoding = getattr(tokenizer, "encoding", None)
+        self._counts: OrderedDict[str, int | None] = OrderedDict()
+
+    def _remember(self, text: str, count: int | None) -> None:
+        self._counts[text] = count
+        if len(self._counts) > _TOKEN_COUNT_CACHE_SIZE:
+            self._counts.popitem(last=False)
+
+    def num_tokens_from_string(self, text: str) -> int:
+        try:
+            count = self._counts[text]
+        except KeyError:
+            count = self.tokenizer.num_tokens_from_string(text)
+            self._remember(text, count)
+        else:
+            self._counts.move_to_end(text)
+        return count
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        # Batch results are answered from this dict, so none are lost to eviction mid-call.
+        batch: dict[str, int] = {}
+        missing = [text for text in dict.fromkeys(texts) if text not in self._counts]
+        if len(missing) > 1 and hasattr(self._encoding, "encode_batch"):
+            try:
+                encoded = self._encoding.encode_batch(missing)
+            except Exception:  # noqa: BLE001 - e.g. special tokens; count them one by one below
+                encoded = []
+            for text, ids in zip(missing, encoded):
+                batch[text] = len(ids)
+                self._remember(text, len(ids))
+        return [batch[text] if text in batch else self.num_tokens_from_string(text) for text in texts]
+
+    def tail_text(self, text: str, max_tokens: int) -> str:
+        """Return the text of the last ``max_tokens`` tokens of ``text``.
+
+        Falls back to the last ``max_tokens`` words when the encoding is unavailable or
+        refuses the text (special tokens).
+        """
+
+        if self._encoding is not None:
+            try:
+                ids = self._encoding.encode(text)
+            except Exception:  # noqa: BLE001 - same failures token_count swallows
+                ids = None
+            if ids is not None:
+                # The cut can land inside a multi-byte character; its leftover bytes are dropped.
+                return self._encoding.decode_bytes(ids[-max_tokens:]).decode("utf-8", errors="ignore").strip()
+        return " ".join(text.split()[-max_tokens:])
+
+
+def count_words(text: str) -> int:
+    """Return ``len(text.split())`` while splitting at most one window of text at a time.
+
+    Large documents would otherwise build a list with one string per word just to take
+    its length; windows end on whitespace so no word is counted twice.
+    """
+
+    length = len(text)
+    if length <= _WORD_COUNT_WINDOW_CHARS:
+        return len(text.split())
+
+    words = 0
+    start = 0
+    while start < length:
+        end = start + _WORD_COUNT_WINDOW_CHARS
+        if end < length:
+            boundary = _whitespace_re.search(text, end)
+            end = boundary.start() if boundary else length
+        words += len(text[start:end].split())
+        start = end
+    return words
 
 
 @dataclass(slots=True)
@@ -43,6 +170,8 @@ class MarkdownChunk:
     headings: List[str]
     block_count: int
     overlap_from_previous_tokens: int = 0
+    # Unwrapped chunk content; ``text`` is this body inside the chunk start/end markers.
+    body_text: str = ""
 
 
 @dataclass(slots=True)
@@ -63,15 +192,18 @@ class ChunkPlan:
 
     def estimated_input_tokens(self, *, parts: int) -> int:
         base = (self.system_prompt_tokens + self.max_user_prompt_tokens)
-        return sum(base + chunk.token_count for chunk in self.chunks) * parts
+        return (base * len(self.chunks) + sum(chunk.token_count for chunk in self.chunks)) * parts
 
     def estimated_cost(self, *, parts: int) -> float | None:
+        return self._cost_for(self.estimated_input_tokens(parts=parts))
+
+    def _cost_for(self, total_tokens: int) -> float | None:
         if self.pricing_input_per_1k <= 0:
             return None
-        total_tokens = self.estimated_input_tokens(parts=parts)
         return round((total_tokens / 1000.0) * self.pricing_input_per_1k, 4)
 
     def to_dict(self, *, parts: int) -> dict[str, object]:
+        estimated_input_tokens = self.estimated_input_tokens(parts=parts)
         return {
             "document": str(self.document),
             "applied_mode": self.applied_mode,
@@ -86,8 +218,8 @@ class ChunkPlan:
             "chunk_overlap_tokens": self.chunk_overlap_tokens,
             "pricing_input_per_1k": self.pricing_input_per_1k,
             "chunk_count": len(self.chunks),
-            "estimated_input_tokens": self.estimated_input_tokens(parts=parts),
-            "estimated_cost": self.estimated_cost(parts=parts),
+            "estimated_input_tokens": estimated_input_tokens,
+            "estimated_cost": self._cost_for(estimated_input_tokens),
             "chunks": [
                 {
                     "chunk_id": chunk.chunk_id,
@@ -115,12 +247,14 @@ def build_chunk_plan(
 ) -> ChunkPlan:
     """Return the chunking plan for a markdown document."""
 
+    if not isinstance(tokenizer, _CachedTokenizer):
+        tokenizer = _CachedTokenizer(tokenizer)
     total_tokens = tokenizer.num_tokens_from_string(markdown_text)
-    total_words = len(markdown_text.split())
+    total_words = count_words(markdown_text)
 
-    system_tokens = tokenizer.num_tokens_from_string(settings.system_prompt)
+    system_tokens = _count_prompt_tokens(tokenizer.tokenizer, settings.system_prompt)
     user_prompt_tokens = [
-        tokenizer.num_tokens_from_string(str(entry.get("prompt", "")))
+        _count_prompt_tokens(tokenizer.tokenizer, str(entry.get("prompt", "")))
         for entry in prompt_entries
     ]
     max_user_tokens = max(user_prompt_tokens) if user_prompt_tokens else 0
@@ -177,7 +311,8 @@ def build_chunk_plan(
     if not need_chunking:
         chunk_text = markdown_text.strip()
         tokens = tokenizer.num_tokens_from_string(chunk_text)
-        words = len(chunk_text.split())
+        # Stripping the ends cannot change the word count.
+        words = total_words
         plan.chunks.append(
             MarkdownChunk(
                 document=document,
@@ -195,6 +330,7 @@ def build_chunk_plan(
                 end_line=markdown_text.count("\n") + 1,
                 headings=["<documento inteiro>"],
                 block_count=1,
+                body_text=chunk_text,
             )
         )
         if not plan.reason:
@@ -217,115 +353,171 @@ def build_chunk_plan(
     return plan
 
 
-def _generate_blocks(markdown_text: str, tokenizer: TokenCount) -> Iterable[ContentBlock]:
+def _build_chunk_plan_in_worker(
+    document: Path,
+    markdown_text: str,
+    settings: Settings,
+    prompt_entries: Sequence[dict[str, object]],
+) -> ChunkPlan:
+    # The tokenizer is rebuilt (once per process) instead of being pickled over.
+    return build_chunk_plan(
+        document=document,
+        markdown_text=markdown_text,
+        settings=settings,
+        tokenizer=get_token_counter(settings.token_counter_model),
+        prompt_entries=prompt_entries,
+    )
+
+
+def build_chunk_plans_parallel(
+    documents: Sequence[tuple[Path, str]],
+    *,
+    settings: Settings,
+    prompt_entries: Sequence[dict[str, object]],
+) -> List[ChunkPlan]:
+    """Build the plans of ``(document, markdown_text)`` pairs in input order.
+
+    Tokenizing and packing are CPU-bound and independent per document, so documents are
+    spread over ``settings.chunking_workers`` processes, never more than one per document.
+    With ``0`` (automatic) the CPU count is used, but small batches stay in this process
+    where worker start-up would cost more than it saves.
+    """
+
+    if not documents:
+        return []
+    workers = settings.chunking_workers
+    if not workers:
+        small_batch = len(documents) < _PARALLEL_PLAN_MIN_DOCUMENTS or (
+            sum(len(markdown_text) for _, markdown_text in documents) < _PARALLEL_PLAN_MIN_CHARS
+        )
+        workers = 1 if small_batch else os.cpu_count() or 1
+    workers = min(workers, len(documents))
+    if workers == 1:
+        return [
+            _build_chunk_plan_in_worker(document, markdown_text, settings, prompt_entries)
+            for document, markdown_text in documents
+        ]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                _build_chunk_plan_in_worker,
+                [document for document, _ in documents],
+                [markdown_text for _, markdown_text in documents],
+                itertools.repeat(settings),
+                itertools.repeat(prompt_entries),
+            )
+        )
+
+
+def _generate_blocks(markdown_text: str, tokenizer: _CachedTokenizer) -> Iterable[ContentBlock]:
     lines = markdown_text.splitlines()
-    sections: List[dict[str, object]] = []
-    current = {
-        "level": 1,
-        "title": "Documento",
-        "start_line": 1,
-        "lines": [],
-    }
-    for idx, line in enumerate(lines, start=1):
-        match = _heading_re.match(line)
+    # Numbered once; sections and the heading-less fallback share these tuples.
+    numbered_lines = list(enumerate(lines, start=1))
+    sections: List[_Section] = []
+    current = _Section(level=1, title="Documento", start_line=1, lines=[])
+    append_line = current.lines.append
+    for numbered_line in numbered_lines:
+        idx, line = numbered_line
+        # Headings always start with "#"; the regex only runs on those lines.
+        match = _heading_re.match(line) if line[:1] == "#" else None
         if match:
-            if current["lines"]:
-                current["end_line"] = idx - 1
+            if current.lines:
+                current.end_line = idx - 1
                 sections.append(current)
-            level = len(match.group(1))
+            level = match.end(1) - match.start(1)
             title = match.group(2).strip() or f"Seção sem título ({idx})"
-            current = {
-                "level": level,
-                "title": title,
-                "start_line": idx,
-                "lines": [(idx, line)],
-            }
+            current = _Section(level=level, title=title, start_line=idx, lines=[numbered_line])
+            append_line = current.lines.append
         else:
-            current.setdefault("lines", []).append((idx, line))
-    if current["lines"]:
-        current["end_line"] = len(lines)
+            append_line(numbered_line)
+    if current.lines:
+        current.end_line = len(lines)
         sections.append(current)
 
+    # Paragraphs are gathered first so their token counts come from one batched call.
+    candidates: List[tuple[str, int, int, Sequence[str]]] = []
     if not sections:
-        paragraphs = _split_paragraphs(lines_with_numbers=[(idx, line) for idx, line in enumerate(lines, start=1)])
-        for para in paragraphs:
-            text = para["text"].strip()
-            if not text:
-                continue
-            tokens = tokenizer.num_tokens_from_string(text)
-            words = len(text.split())
-            yield ContentBlock(
-                text=text,
-                start_line=para["start_line"],
-                end_line=para["end_line"],
-                heading_path=("Documento",),
-                tokens=tokens,
-                words=words,
-            )
-        return
+        paragraphs = _split_paragraphs(numbered_lines, lines)
+        for text, start_line, end_line in zip(paragraphs.texts, paragraphs.start_lines, paragraphs.end_lines):
+            if text:
+                candidates.append((text, start_line, end_line, ("Documento",)))
+    else:
+        heading_stack: List[tuple[int, str]] = []
+        for section in sections:
+            level = section.level
+            title = section.title
+            while heading_stack and heading_stack[-1][0] >= level:
+                heading_stack.pop()
+            heading_stack.append((level, title))
+            heading_path = tuple(item[1] for item in heading_stack)
+            paragraphs = _split_paragraphs(section.lines, lines)
+            for text, start_line, end_line in zip(paragraphs.texts, paragraphs.start_lines, paragraphs.end_lines):
+                if text:
+                    candidates.append((text, start_line, end_line, heading_path))
+
+    token_counts = tokenizer.count_many([candidate[0] for candidate in candidates])
+    for (text, start_line, end_line, heading_path), tokens in zip(candidates, token_counts):
+        yield ContentBlock(
+            text=text,
+            start_line=start_line,
+            end_line=end_line,
+            heading_path=heading_path,
+            tokens=tokens,
+            words=count_words(text),
+        )
 
-    heading_stack: List[tuple[int, str]] = []
-    for section in sections:
-        level = section["level"]
-        title = section["title"]
-        while heading_stack and heading_stack[-1][0] >= level:
-            heading_stack.pop()
-        heading_stack.append((level, title))
-        heading_path = tuple(item[1] for item in heading_stack)
-        paragraphs = _split_paragraphs(section["lines"])
-        for para in paragraphs:
-            text = para["text"].strip()
-            if not text:
-                continue
-            tokens = tokenizer.num_tokens_from_string(text)
-            words = len(text.split())
-            yield ContentBlock(
-                text=text,
-                start_line=para["start_line"],
-                end_line=para["end_line"],
-                heading_path=heading_path,
-                tokens=tokens,
-                words=words,
-            )
 
+@dataclass(slots=True)
+class _Section:
+    """Lines under one heading (or before the first heading) of a markdown document."""
 
-def _split_paragraphs(lines_with_numbers: Sequence[tuple[int, str]]) -> List[dict[str, object]]:
-    paragraphs: List[dict[str, object]] = []
-    buffer: List[str] = []
-    start_line = lines_with_numbers[0][0] if lines_with_numbers else 1
-    current_start = start_line
-
-    def flush(end_line: int) -> None:
-        nonlocal buffer, current_start
-        if not buffer:
-            return
-        text = "\n".join(buffer).strip()
-        paragraphs.append({
-            "text": text,
-            "start_line": current_start,
-            "end_line": end_line,
-        })
-        buffer = []
-
-    last_line = start_line
-    for line_number, text in lines_with_numbers:
+    level: int
+    title: str
+    start_line: int
+    lines: List[tuple[int, str]]
+    end_line: int = 0
+
+
+@dataclass(slots=True)
+class _Paragraphs:
+    """Paragraphs of a line range as parallel lists (text, first line, last line)."""
+
+    texts: List[str] = field(default_factory=list)
+    start_lines: List[int] = field(default_factory=list)
+    end_lines: List[int] = field(default_factory=list)
+
+
+def _split_paragraphs(lines_with_numbers: Sequence[tuple[int, str]], lines: Sequence[str]) -> _Paragraphs:
+    paragraphs = _Paragraphs()
+    # Index into ``lines_with_numbers`` where the open paragraph starts; lines are only
+    # joined once the paragraph is closed.
+    open_at: int | None = None
+
+    def flush(end_index: int, end_line: int) -> None:
+        start_line = lines_with_numbers[open_at][0]
+        # Numbered lines are consecutive, so the paragraph is a plain slice of ``lines``.
+        paragraphs.texts.append("\n".join(lines[start_line - 1:end_line]).strip())
+        paragraphs.start_lines.append(start_line)
+        paragraphs.end_lines.append(end_line)
+
+    for index, (line_number, text) in enumerate(lines_with_numbers):
         if not text.strip():
-            flush(line_number - 1)
-            current_start = line_number + 1
-            last_line = line_number
+            if open_at is not None:
+                flush(index, line_number - 1)
+                open_at = None
             continue
-        if not buffer:
-            current_start = line_number
-        buffer.append(text)
-        last_line = line_number
-    flush(last_line)
+        if open_at is None:
+            open_at = index
+    if open_at is not None:
+        flush(len(lines_with_numbers), lines_with_numbers[-1][0])
     return paragraphs
 
 
 def _enforce_block_limits(
     blocks: Iterable[ContentBlock],
     chunk_max_tokens: int,
-    tokenizer: TokenCount,
+    tokenizer: _CachedTokenizer,
 ) -> Iterable[ContentBlock]:
     for block in blocks:
         if block.tokens <= chunk_max_tokens:
@@ -333,12 +525,13 @@ def _enforce_block_limits(
             continue
 
         segments = _split_text_to_token_limit(block.text, chunk_max_tokens, tokenizer)
-        for idx, segment in enumerate(segments, start=1):
-            text = segment.strip()
+        texts = [segment.strip() for segment in segments]
+        token_counts = iter(tokenizer.count_many([text for text in texts if text]))
+        for idx, text in enumerate(texts, start=1):
             if not text:
                 continue
-            tokens = tokenizer.num_tokens_from_string(text)
-            words = len(text.split())
+            tokens = next(token_counts)
+            words = count_words(text)
             yield ContentBlock(
                 text=text,
                 start_line=block.start_line,
@@ -355,23 +548,19 @@ def _enforce_block_limits(
                 )
 
 
-def _split_text_to_token_limit(text: str, max_tokens: int, tokenizer: TokenCount) -> List[str]:
-    sentences = _sentence_split_re.split(text)
-    if not sentences or tokenizer.num_tokens_from_string(text) <= max_tokens:
+def _split_text_to_token_limit(text: str, max_tokens: int, tokenizer: _CachedTokenizer) -> List[str]:
+    if tokenizer.num_tokens_from_string(text) <= max_tokens:
         return [text]
+    sentences = _sentence_split_re.split(text)
 
     segments: List[str] = []
     buffer: List[str] = []
     buffer_tokens = 0
-    for sentence in sentences:
-        sentence_tokens = tokenizer.num_tokens_from_string(sentence)
+    for sentence, sentence_tokens in zip(sentences, tokenizer.count_many(sentences)):
         if sentence_tokens > max_tokens:
             words = sentence.split()
             step = max(1, math.ceil(len(words) / math.ceil(sentence_tokens / max_tokens)))
-            for idx in range(0, len(words), step):
-                slice_words = words[idx: idx + step]
-                slice_text = " ".join(slice_words)
-                segments.append(slice_text)
+            segments.extend(" ".join(words[idx: idx + step]) for idx in range(0, len(words), step))
             continue
         if buffer_tokens + sentence_tokens > max_tokens and buffer:
             segments.append(" ".join(buffer))
@@ -391,51 +580,31 @@ def _build_chunks_from_blocks(
     tokenizer: TokenCount,
 ) -> List[MarkdownChunk]:
     chunks: List[MarkdownChunk] = []
-    current_blocks: List[ContentBlock] = []
-    current_tokens = 0
+    total_blocks = len(blocks)
+    # Prefix sums of block tokens; token counts are non-negative, so they are sorted and
+    # each cut point is a binary search instead of a walk over the blocks in between.
+    cumulative = list(itertools.accumulate(block.tokens for block in blocks))
+    start = 0
     chunk_index = 0
 
-    for idx, block in enumerate(blocks):
-        next_block_exists = idx < len(blocks) - 1
-        if current_blocks and current_tokens + block.tokens > plan.chunk_max_tokens:
-            chunk_index += 1
-            chunks.append(
-                _finalize_chunk(
-                    plan,
-                    chunk_index,
-                    current_blocks,
-                    tokenizer,
-                )
-            )
-            current_blocks = []
-            current_tokens = 0
-
-        current_blocks.append(block)
-        current_tokens += block.tokens
-
-        if current_tokens >= plan.chunk_target_tokens and next_block_exists:
-            chunk_index += 1
-            chunks.append(
-                _finalize_chunk(
-                    plan,
-                    chunk_index,
-                    current_blocks,
-                    tokenizer,
-                )
-            )
-            current_blocks = []
-            current_tokens = 0
+    while start < total_blocks:
+        base = cumulative[start - 1] if start else 0
+        # First block whose running total reaches the target; the chunk ends after it.
+        target_idx = bisect.bisect_left(cumulative, base + plan.chunk_target_tokens, start)
+        # First later block that would push the chunk past the max; the chunk ends before it.
+        overflow_idx = bisect.bisect_right(cumulative, base + plan.chunk_max_tokens, start + 1)
+        end = overflow_idx if overflow_idx <= target_idx else min(target_idx + 1, total_blocks)
 
-    if current_blocks:
         chunk_index += 1
         chunks.append(
             _finalize_chunk(
                 plan,
                 chunk_index,
-                current_blocks,
+                blocks[start:end],
                 tokenizer,
             )
         )
+        start = end
 
     order_fix(chunks, plan, tokenizer)
     return chunks
@@ -447,37 +616,28 @@ def _finalize_chunk(
     blocks: Sequence[ContentBlock],
     tokenizer: TokenCount,
 ) -> MarkdownChunk:
-    total_chunks_placeholder = chunk_index  # updated later
     chunk_id = f"chunk_{chunk_index:02d}"
 
-    headings = []
-    for block in blocks:
-        for heading in block.heading_path:
-            if heading not in headings:
-                headings.append(heading)
+    # dict keeps first-seen order while making the duplicate check O(1).
+    headings = list(dict.fromkeys(heading for block in blocks for heading in block.heading_path))
 
     body_parts: List[str] = []
     body_parts.extend(block.text.strip() for block in blocks if block.text.strip())
     body_text = "\n\n".join(body_parts).strip()
 
-    start_line = min(block.start_line for block in blocks)
-    end_line = max(block.end_line for block in blocks)
-
-    wrapped_text = wrap_chunk_text(
-        chunk_id=chunk_id,
-        chunk_index=chunk_index,
-        total_chunks=total_chunks_placeholder,
-        body_text=body_text,
-    )
+    # Blocks arrive in document order, so the line range is given by the endpoints.
+    start_line = blocks[0].start_line
+    end_line = blocks[-1].end_line
 
     tokens = tokenizer.num_tokens_from_string(body_text)
-    words = len(body_text.split())
+    words = count_words(body_text)
 
     chunk = MarkdownChunk(
         document=plan.document,
         chunk_id=chunk_id,
         index=chunk_index,
-        text=wrapped_text,
+        # Wrapped by order_fix once the total number of chunks is known.
+        text="",
         token_count=tokens,
         word_count=words,
         start_line=start_line,
@@ -485,6 +645,7 @@ def _finalize_chunk(
         headings=headings,
         block_count=len(blocks),
         overlap_from_previous_tokens=0,
+        body_text=body_text,
     )
 
     return chunk
@@ -494,40 +655,43 @@ def order_fix(chunks: List[MarkdownChunk], plan: ChunkPlan, tokenizer: TokenCoun
     total = len(chunks)
     if total == 0:
         return
+    if not isinstance(tokenizer, _CachedTokenizer):
+        tokenizer = _CachedTokenizer(tokenizer)
 
+    # Chunks are wrapped once, after numbering and overlap. Line boundaries other than
+    # "\n" are normalised to "\n" as chunk bodies always have been; only those bodies are
+    # re-tokenized, everything else keeps the counts taken in _finalize_chunk. Every
+    # such boundary is whitespace to str.split(), so word counts never change here.
     for chunk in chunks:
-        body = _strip_chunk_wrapping(chunk.text)
-        chunk.text = wrap_chunk_text(
-            chunk_id=chunk.chunk_id,
-            chunk_index=chunk.index,
-            total_chunks=total,
-            body_text=body,
-        )
-        chunk.token_count = tokenizer.num_tokens_from_string(body)
-        chunk.word_count = len(body.split())
+        if _foreign_line_break_re.search(chunk.body_text) is not None:
+            chunk.body_text = "\n".join(chunk.body_text.splitlines()).strip()
+            chunk.token_count = tokenizer.num_tokens_from_string(chunk.body_text)
 
     for idx, chunk in enumerate(chunks):
         if idx == len(chunks) - 1 or plan.chunk_overlap_tokens <= 0:
             continue
-        overlap_source = chunk.text
-        overlap_text = _extract_overlap_text(overlap_source, plan.chunk_overlap_tokens, tokenizer)
+        overlap_text = _extract_overlap_text(chunk.body_text, plan.chunk_overlap_tokens, tokenizer)
         next_chunk = chunks[idx + 1]
         if overlap_text:
-            body = _strip_chunk_wrapping(next_chunk.text)
-            combined = f"<!-- overlap-from-previous chunk={chunk.chunk_id} -->\n{overlap_text}\n\n{body}".strip()
-            next_chunk.text = wrap_chunk_text(
-                chunk_id=next_chunk.chunk_id,
-                chunk_index=next_chunk.index,
-                total_chunks=total,
-                body_text=combined,
-            )
+            marker = f"<!-- overlap-from-previous chunk={chunk.chunk_id} -->"
+            combined = f"{marker}\n{overlap_text}\n\n{next_chunk.body_text}".strip()
+            next_chunk.body_text = combined
             next_chunk.token_count = tokenizer.num_tokens_from_string(combined)
-            next_chunk.word_count = len(combined.split())
+            # The parts are joined by line breaks, so their word counts simply add up.
+            next_chunk.word_count += count_words(marker) + count_words(overlap_text)
             next_chunk.overlap_from_previous_tokens = min(
                 plan.chunk_overlap_tokens,
                 next_chunk.token_count,
             )
 
+    for chunk in chunks:
+        chunk.text = wrap_chunk_text(
+            chunk_id=chunk.chunk_id,
+            chunk_index=chunk.index,
+            total_chunks=total,
+            body_text=chunk.body_text,
+        )
+
 
 def wrap_chunk_text(*, chunk_id: str, chunk_index: int, total_chunks: int, body_text: str) -> str:
     return (
@@ -537,49 +701,45 @@ def wrap_chunk_text(*, chunk_id: str, chunk_index: int, total_chunks: int, body_
     ).strip() + "\n"
 
 
-def _strip_chunk_wrapping(text: str) -> str:
-    lines = text.splitlines()
-    if len(lines) >= 2 and lines[0].startswith("<!-- ") and lines[-1].startswith("<!-- "):
-        return "\n".join(lines[1:-1]).strip()
-    return text.strip()
-
-
-def _extract_overlap_text(text: str, desired_tokens: int, tokenizer: TokenCount) -> str:
+def _extract_overlap_text(body: str, desired_tokens: int, tokenizer: _CachedTokenizer) -> str:
     if desired_tokens <= 0:
         return ""
-    body = _strip_chunk_wrapping(text)
-    words = body.split()
-    if not words:
-        return ""
-    count = min(len(words), desired_tokens)
-    overlap_words = words[-count:]
-    return " ".join(overlap_words)
+    return tokenizer.tail_text(body, desired_tokens)
 
 
 def save_chunk_plan(plan: ChunkPlan, *, settings, parts: int) -> None:
     plan_path = settings.chunk_plan_json_path(plan.document)
-    plan_path.parent.mkdir(parents=True, exist_ok=True)
-    plan_path.write_text(json.dumps(plan.to_dict(parts=parts), ensure_ascii=False, indent=2), encoding="utf-8")
+    ensure_directory(plan_path.parent)
+    if orjson is not None:
+        plan_path.write_bytes(orjson.dumps(plan.to_dict(parts=parts), option=orjson.OPT_INDENT_2))
+    else:
+        plan_path.write_text(json.dumps(plan.to_dict(parts=parts), ensure_ascii=False, indent=2), encoding="utf-8")
 
     map_path = settings.chunk_map_markdown_path(plan.document)
-    map_path.parent.mkdir(parents=True, exist_ok=True)
+    ensure_directory(map_path.parent)
     map_path.write_text(render_chunk_map(plan), encoding="utf-8")
 
 
 def render_chunk_map(plan: ChunkPlan) -> str:
-    lines = [
-        f"# Mapa de chunks para {plan.document.name}",
-        "",
-        f"- Modo aplicado: **{plan.applied_mode}**",
-        f"- Motivo: {plan.reason}",
-        f"- Chunks gerados: **{len(plan.chunks)}**",
-        "",
-        "| Chunk | Tokens | Palavras | Linhas | Seções |",
-        "| ----- | ------ | -------- | ------ | ------ |",
-    ]
+    out = io.StringIO()
+    out.write(
+        f"# Mapa de chunks para {plan.document.name}\n"
+        "\n"
+        f"- Modo aplicado: **{plan.applied_mode}**\n"
+        f"- Motivo: {plan.reason}\n"
+        f"- Chunks gerados: **{len(plan.chunks)}**\n"
+        "\n"
+        "| Chunk | Tokens | Palavras | Linhas | Seções |\n"
+        "| ----- | ------ | -------- | ------ | ------ |\n"
+    )
     for chunk in plan.chunks:
-        heading_preview = ", ".join(chunk.headings[:3])
-        lines.append(
-            f"| {chunk.chunk_id} | {chunk.token_count} | {chunk.word_count} | {chunk.start_line}-{chunk.end_line} | {heading_preview} |")
-    lines.append("")
-    return "\n".join(lines)
\ No newline at end of file
+        headings = chunk.headings
+        if len(headings) > 3:
+            heading_preview = f"{headings[0]}, {headings[1]}, {headings[2]}"
+        elif len(headings) == 1:
+            heading_preview = headings[0]
+        else:
+            heading_preview = ", ".join(headings)
+        out.write(
+            f"| {chunk.chunk_id} | {chunk.token_count} | {chunk.word_count} | {chunk.start_line}-{chunk.end_line} | {heading_preview} |\n")
+    return out.getvalue()
@@ -1,20 +1,55 @@
 from __future__ import annotations
 
+import fnmatch
+import functools
 import logging
 import os
+import re
+import string
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, List
+from typing import Any, Callable, List
 
-try:
-    from dotenv import find_dotenv, load_dotenv  # type: ignore
-except ModuleNotFoundError:  # pragma: no cover - optional dependency
-    find_dotenv = load_dotenv = None
-
-if load_dotenv:
-    load_dotenv(find_dotenv())
+logger = logging.getLogger(__name__)
+_ENV = os.environ
 
 BASE_DIR = Path(__file__).resolve().parents[1]
+
+# Values that switch an on/off env var off; unset counts as off too.
+_FALSY_ENV_VALUES = frozenset({"0", "false", "False"})
+
+# Set once the .env has been loaded; worker processes inherit it with the environment.
+_DOTENV_LOADED_ENV = "_DOTENV_LOADED"
+
+
+@functools.lru_cache(maxsize=1)
+def _ensure_dotenv() -> None:
+    """Load the .env once per process tree instead of on every import.
+
+    Only the working directory and the project root are checked; searching every parent
+    directory (python-dotenv's ``find_dotenv``) is opt-in through ``DOTENV_SEARCH=1``.
+    """
+
+    if os.environ.get(_DOTENV_LOADED_ENV):
+        return
+    os.environ[_DOTENV_LOADED_ENV] = "1"
+    dotenv_path = next(
+        (path for path in (os.path.join(os.getcwd(), ".env"), str(BASE_DIR / ".env")) if os.path.isfile(path)),
+        None,
+    )
+    search_parents = os.environ.get("DOTENV_SEARCH", "0") not in _FALSY_ENV_VALUES
+    if dotenv_path is None and not search_parents:
+        return
+    try:
+        from dotenv import find_dotenv, load_dotenv  # type: ignore
+    except ModuleNotFoundError:  # pragma: no cover - optional dependency
+        return
+    load_dotenv(dotenv_path or find_dotenv())
+
+
+# Module-level and class-level defaults below read the environment at import time.
+_ensure_dotenv()
+
 PROMPTS_DIR = Path(os.getenv("PROMPTS_DIR", BASE_DIR / "prompts"))
 DEFAULT_SYSTEM_PROMPT_PATH = PROMPTS_DIR / "system_prompt.txt"
 DEFAULT_USER_PROMPT_PATH = PROMPTS_DIR / "user_prompt.md"
@@ -31,6 +66,11 @@ DEFAULT_MODEL_CONTEXT_LIMITS: dict[str, int] = {
     "gpt-3.5-turbo": 16_385,
 }
 
+DEFAULT_TOKEN_COUNTER_MODEL = os.getenv("TOKEN_COUNTER_MODEL", "gpt-3.5-turbo")
+
+CHUNKING_MODES = frozenset({"auto", "force", "off"})
+DEFAULT_PROMPT_DISPLAYS = frozenset({"default", "inline-override"})
+
 DEFAULT_SYSTEM_PROMPT_FALLBACK = "Você é um(a) Analista Jurídico(a) especializado(a) em processos do Judiciário brasileiro.\nReceberá a seguir o CONTEÚDO INTEGRAL de um processo em Markdown."
 
 DEFAULT_USER_PROMPT_FALLBACK = (
@@ -123,48 +163,160 @@ DEFAULT_USER_PROMPT_FALLBACK = (
 )
 
 
+@functools.lru_cache(maxsize=32)
+def _read_text_cached(path: str, mtime_ns: int) -> str:
+    # Raw os.read calls and one decode; no TextIOWrapper for these small files.
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        block_size = max(os.fstat(fd).st_size, 1 << 16)
+        blocks = []
+        while block := os.read(fd, block_size):
+            blocks.append(block)
+    finally:
+        os.close(fd)
+    text = b"".join(blocks).decode("utf-8")
+    if "\r" in text:
+        # Same universal-newline translation as Path.read_text.
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _read_text(path: Path) -> str:
+    """Read a UTF-8 text file, reusing the last read while its mtime is unchanged."""
+
+    return _read_text_cached(str(path), path.stat().st_mtime_ns)
+
+
 def _read_prompt(path: Path, fallback: str) -> str:
     try:
-        return path.read_text(encoding="utf-8").strip()
+        return _read_text(path).strip()
     except OSError:
         return fallback
 
 
-DEFAULT_SYSTEM_PROMPT = _read_prompt(DEFAULT_SYSTEM_PROMPT_PATH, DEFAULT_SYSTEM_PROMPT_FALLBACK)
-DEFAULT_USER_PROMPT_TEMPLATE = _read_prompt(DEFAULT_USER_PROMPT_PATH, DEFAULT_USER_PROMPT_FALLBACK)
+_DEFAULT_PROMPT_SOURCES = {
+    "DEFAULT_SYSTEM_PROMPT": (DEFAULT_SYSTEM_PROMPT_PATH, DEFAULT_SYSTEM_PROMPT_FALLBACK),
+    "DEFAULT_USER_PROMPT_TEMPLATE": (DEFAULT_USER_PROMPT_PATH, DEFAULT_USER_PROMPT_FALLBACK),
+}
+
+
+def __getattr__(name: str) -> str:
+    # The default prompts are read on first use (then cached by mtime), not at import.
+    try:
+        path, fallback = _DEFAULT_PROMPT_SOURCES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    return _read_prompt(path, fallback)
 
 
-def _int_from_env(name: str, default: int) -> int:
+def _prompt_from_env(name: str, default_name: str) -> str:
     raw = os.getenv(name)
-    if raw is None:
-        return default
+    if raw is not None:
+        return raw
+    return _read_prompt(*_DEFAULT_PROMPT_SOURCES[default_name])
+
+
+_PROMPT_FIELDS = frozenset({"document_name", "markdown_content"})
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_template(template: str) -> tuple[tuple[str, str | None], ...] | None:
+    """Split ``template`` once into ``(literal, field)`` pieces with ``{{``/``}}`` already unescaped.
+
+    Returns ``None`` for templates using anything beyond plain ``{document_name}`` and
+    ``{markdown_content}`` fields, which are left to ``str.format``.
+    """
+
+    pieces: List[tuple[str, str | None]] = []
     try:
-        return int(raw)
+        for literal, name, format_spec, conversion in string.Formatter().parse(template):
+            if name is not None and (format_spec or conversion or name not in _PROMPT_FIELDS):
+                return None
+            pieces.append((literal, name))
     except ValueError:
-        logging.getLogger(__name__).warning("Invalid integer for %s=%s; using default %s", name, raw, default)
-        return default
+        return None
+    return tuple(pieces)
 
 
-def _float_from_env(name: str, default: float) -> float:
-    raw = os.getenv(name)
-    if raw is None:
+def render_prompt(template: str, *, document_name: str, markdown_content: str) -> str:
+    """Fill a user prompt template; equivalent to ``template.format(...)`` with both fields."""
+
+    pieces = _compile_template(template)
+    if pieces is None:
+        return template.format(document_name=document_name, markdown_content=markdown_content)
+    values = {"document_name": document_name, "markdown_content": markdown_content}
+    return "".join(literal + values[name] if name else literal for literal, name in pieces)
+
+
+@functools.lru_cache(maxsize=8)
+def _glob_matcher(pattern: str) -> Callable[[str], re.Match[str] | None]:
+    # Same matching as fnmatch.fnmatch, including its case folding on Windows.
+    return re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+
+
+@functools.lru_cache(maxsize=8)
+def _discover_prompt_parts_cached(directory: str, pattern: str, mtime_ns: int) -> tuple[Path, ...]:
+    matches = _glob_matcher(pattern)
+    normcase = os.path.normcase
+    with os.scandir(directory) as entries:
+        return tuple(sorted(
+            Path(entry.path)
+            for entry in entries
+            if matches(normcase(entry.name)) and entry.is_file()
+        ))
+
+
+def _discover_prompt_parts(directory: Path, pattern: str) -> List[Path]:
+    """Return the files in ``directory`` matching ``pattern``, sorted.
+
+    The listing is cached until the directory's mtime changes, which happens whenever a
+    file is added, removed or renamed in it.
+    """
+
+    if "/" in pattern or os.sep in pattern:
+        # Patterns reaching into subdirectories keep using pathlib's glob.
+        return [path for path in sorted(directory.glob(pattern)) if path.is_file()]
+    try:
+        mtime_ns = directory.stat().st_mtime_ns
+        return list(_discover_prompt_parts_cached(str(directory), pattern, mtime_ns))
+    except OSError:
+        return []
+
+
+# Warning wording for each supported cast: (type name, format of the default value).
+_ENV_CASTS: dict[type, tuple[str, str]] = {
+    int: ("integer", "%s"),
+    float: ("float", "%.3f"),
+}
+
+
+def _coerce(name: str, default: Any, cast: type, *, optional: bool = False) -> Any:
+    """Parse env var ``name`` with ``cast``; unset or invalid values give ``default``.
+
+    With ``optional`` a blank value counts as unset and an invalid one is ignored
+    rather than replaced by the default.
+    """
+
+    raw = _ENV.get(name)
+    if raw is None or (optional and not raw.strip()):
         return default
     try:
-        return float(raw)
+        return cast(raw)
     except ValueError:
-        logging.getLogger(__name__).warning("Invalid float for %s=%s; using default %.3f", name, raw, default)
+        label, default_format = _ENV_CASTS[cast]
+        if optional:
+            logger.warning("Invalid %s for %s=%s; ignoring override", label, name, raw)
+        else:
+            logger.warning("Invalid %s for %s=%s; using default " + default_format, label, name, raw, default)
         return default
 
 
-def _optional_int_from_env(name: str) -> int | None:
-    raw = os.getenv(name)
-    if raw is None or not raw.strip():
-        return None
-    try:
-        return int(raw)
-    except ValueError:
-        logging.getLogger(__name__).warning("Invalid integer for %s=%s; ignoring override", name, raw)
-        return None
+# First line that is neither blank nor a "#" comment, without surrounding whitespace.
+_API_KEY_LINE_RE = re.compile(r"^\s*([^\s#].*?)\s*$", re.MULTILINE)
+
+
+def _flag_from_env(name: str) -> bool:
+    return _ENV.get(name, "0") not in _FALSY_ENV_VALUES
 
 
 def _load_openai_api_key() -> str | None:
@@ -176,23 +328,34 @@ def _load_openai_api_key() -> str | None:
 
     file_path = Path(os.getenv("OPENAI_API_KEY_FILE", "openai_api_key.txt"))
     try:
-        content = file_path.read_text(encoding="utf-8")
+        # The file is only re-read after it changes.
+        content = _read_text(file_path)
     except OSError:
         return None
 
-    for line in content.splitlines():
-        stripped = line.strip()
-        if not stripped or stripped.startswith("#"):
-            continue
-        if "=" in stripped:
-            _, value = stripped.split("=", 1)
-            return value.strip().strip('"').strip("'") or None
-        return stripped.strip('"').strip("'") or None
+    match = _API_KEY_LINE_RE.search(content)
+    if match is None:
+        return None
+    value = match.group(1)
+    if "=" in value:
+        value = value.split("=", 1)[1].strip()
+    return value.strip('"').strip("'") or None
+
+
+# Directories this process has already created or found; the pipeline never removes them.
+_ENSURED_DIRECTORIES: set[Path] = set()
 
-    return None
 
+def ensure_directory(path: Path) -> None:
+    """``mkdir -p`` ``path`` once per process; later calls for the same path are free."""
 
-@dataclass
+    if path in _ENSURED_DIRECTORIES:
+        return
+    os.makedirs(path, exist_ok=True)
+    _ENSURED_DIRECTORIES.add(path)
+
+
+@dataclass(slots=True)
 class Settings:
     """Runtime configuration for the docling + AI pipeline."""
 
@@ -202,27 +365,40 @@ class Settings:
 
     chunk_metadata_dir: Path = field(default_factory=lambda: Path(os.getenv("AI_CHUNK_METADATA_DIR", "chunk_metadata")))
     chunking_mode: str = field(default_factory=lambda: os.getenv("AI_CHUNKING_MODE", "auto"))
-    chunk_target_tokens: int = field(default_factory=lambda: _int_from_env("AI_CHUNK_TARGET_TOKENS", 10_000))
-    chunk_max_tokens: int = field(default_factory=lambda: _int_from_env("AI_CHUNK_MAX_TOKENS", 12_000))
-    chunk_overlap_tokens: int = field(default_factory=lambda: _int_from_env("AI_CHUNK_OVERLAP_TOKENS", 200))
-    chunk_context_fraction: float = field(default_factory=lambda: _float_from_env("AI_CHUNK_CONTEXT_FRACTION", 0.8))
-    chunk_pricing_input_per_1k: float = field(default_factory=lambda: _float_from_env("AI_CHUNK_PRICING_INPUT_PER_1K", 0.0))
-
-    model_context_limit_override: int | None = field(default_factory=lambda: _optional_int_from_env("AI_MODEL_CONTEXT_LIMIT"))
-
-    openai_api_key: str | None = field(default_factory=_load_openai_api_key)
+    chunk_target_tokens: int = field(default_factory=lambda: _coerce("AI_CHUNK_TARGET_TOKENS", 10_000, int))
+    chunk_max_tokens: int = field(default_factory=lambda: _coerce("AI_CHUNK_MAX_TOKENS", 12_000, int))
+    chunk_overlap_tokens: int = field(default_factory=lambda: _coerce("AI_CHUNK_OVERLAP_TOKENS", 200, int))
+    chunk_context_fraction: float = field(default_factory=lambda: _coerce("AI_CHUNK_CONTEXT_FRACTION", 0.8, float))
+    chunk_pricing_input_per_1k: float = field(default_factory=lambda: _coerce("AI_CHUNK_PRICING_INPUT_PER_1K", 0.0, float))
+    chunking_workers: int = field(default_factory=lambda: _coerce("AI_CHUNKING_WORKERS", 0, int))
+    conversion_workers: int = field(default_factory=lambda: _coerce("CONVERSION_WORKERS", 0, int))
+
+    model_context_limit_override: int | None = field(default_factory=lambda: _coerce("AI_MODEL_CONTEXT_LIMIT", None, int, optional=True))
+
+    # Resolved on first use by get_openai_api_key(); conversion-only runs never need it.
+    openai_api_key: str | None = None
     openai_model: str = os.getenv("OPENAI_MODEL", "o4-mini-2025-04-16")
-    token_counter_model: str = os.getenv("TOKEN_COUNTER_MODEL", "gpt-3.5-turbo")
-
-    system_prompt: str = os.getenv("AI_SYSTEM_PROMPT", DEFAULT_SYSTEM_PROMPT)
-    user_prompt_template: str = os.getenv("AI_USER_PROMPT_TEMPLATE", DEFAULT_USER_PROMPT_TEMPLATE)
+    ai_max_concurrency: int = field(default_factory=lambda: _coerce("AI_MAX_CONCURRENCY", 8, int))
+    ai_max_retries: int = field(default_factory=lambda: _coerce("AI_MAX_RETRIES", 3, int))
+    use_batch_api: bool = _flag_from_env("AI_USE_BATCH_API")
+    batch_threshold: int = field(default_factory=lambda: _coerce("AI_BATCH_THRESHOLD", 1, int))
+    batch_poll_seconds: float = field(default_factory=lambda: _coerce("AI_BATCH_POLL_SECONDS", 30.0, float))
+    enable_input_batching: bool = _flag_from_env("AI_INPUT_BATCHING")
+    batch_input_token_budget: int = field(default_factory=lambda: _coerce("AI_BATCH_INPUT_TOKEN_BUDGET", 50_000, int))
+    enable_response_cache: bool = _flag_from_env("AI_RESPONSE_CACHE")
+    token_counter_model: str = DEFAULT_TOKEN_COUNTER_MODEL
+
+    system_prompt: str = field(default_factory=lambda: _prompt_from_env("AI_SYSTEM_PROMPT", "DEFAULT_SYSTEM_PROMPT"))
+    user_prompt_template: str = field(
+        default_factory=lambda: _prompt_from_env("AI_USER_PROMPT_TEMPLATE", "DEFAULT_USER_PROMPT_TEMPLATE")
+    )
     user_prompt_parts_dir: Path = field(
         default_factory=lambda: Path(os.getenv("AI_USER_PROMPT_PART_DIR", str(PROMPTS_DIR)))
     )
     user_prompt_parts_pattern: str = os.getenv("AI_USER_PROMPT_PART_PATTERN", "user_prompt_part*.md")
     user_prompt_parts: List[Path] = field(default_factory=list)
 
-    skip_existing_ai_outputs: bool = os.getenv("AI_SKIP_EXISTING", "0") not in {"0", "false", "False"}
+    skip_existing_ai_outputs: bool = _flag_from_env("AI_SKIP_EXISTING")
 
     def __post_init__(self) -> None:
         if not isinstance(self.user_prompt_parts_dir, Path):
@@ -232,8 +408,8 @@ class Settings:
             self.chunk_metadata_dir = Path(self.chunk_metadata_dir)
 
         self.chunking_mode = self.chunking_mode.lower()
-        if self.chunking_mode not in {"auto", "force", "off"}:
-            logging.getLogger(__name__).warning(
+        if self.chunking_mode not in CHUNKING_MODES:
+            logger.warning(
                 "Invalid AI_CHUNKING_MODE=%s; falling back to 'auto'",
                 self.chunking_mode,
             )
@@ -245,28 +421,45 @@ class Settings:
         if self.chunk_overlap_tokens < 0:
             self.chunk_overlap_tokens = 0
 
-        if not self.user_prompt_parts:
-            self.user_prompt_parts = [
-                path
-                for path in sorted(self.user_prompt_parts_dir.glob(self.user_prompt_parts_pattern))
-                if path.is_file()
-            ]
+        if self.chunking_workers < 0:
+            self.chunking_workers = 0
+        if self.conversion_workers < 0:
+            self.conversion_workers = 0
+
+        if self.ai_max_concurrency < 1:
+            self.ai_max_concurrency = 1
+        if self.ai_max_retries < 1:
+            self.ai_max_retries = 1
+
+        if self.batch_threshold < 1:
+            self.batch_threshold = 1
+
+        if self.batch_poll_seconds <= 0:
+            self.batch_poll_seconds = 30.0
 
+        # An env template replaces the prompt parts, so the directory is not even listed.
         if os.getenv("AI_USER_PROMPT_TEMPLATE") is not None:
             self.user_prompt_parts = []
+        elif not self.user_prompt_parts:
+            self.user_prompt_parts = _discover_prompt_parts(
+                self.user_prompt_parts_dir,
+                self.user_prompt_parts_pattern,
+            )
 
     def ensure_directories(self, *, include_ai: bool = True) -> None:
         """Create required directories if they do not exist."""
 
-        for path in self._iter_directories(include_ai=include_ai):
-            path.mkdir(parents=True, exist_ok=True)
+        # Read at call time: CLI overrides replace these paths after construction.
+        directories = (self.pdf_input_dir, self.md_output_dir, self.ai_output_dir, self.chunk_metadata_dir)
+        for path in directories if include_ai else directories[:2]:
+            ensure_directory(path)
+
+    def get_openai_api_key(self) -> str | None:
+        """Return the OpenAI API key, resolving it from env vars or the key file once."""
 
-    def _iter_directories(self, *, include_ai: bool = True) -> Iterable[Path]:
-        yield self.pdf_input_dir
-        yield self.md_output_dir
-        if include_ai:
-            yield self.ai_output_dir
-            yield self.chunk_metadata_dir
+        if self.openai_api_key is None:
+            self.openai_api_key = _load_openai_api_key()
+        return self.openai_api_key
 
     def get_model_context_limit(self) -> int | None:
         """Return the maximum context size (tokens) supported by the configured model."""
@@ -283,6 +476,15 @@ class Settings:
         safe_name = markdown_file.stem
         return self.chunk_metadata_dir / f"{safe_name}_chunk_map.md"
 
+    def render_user_prompt(self, document_name: str, markdown_content: str) -> str:
+        """Return ``user_prompt_template`` filled in for one document."""
+
+        return render_prompt(
+            self.user_prompt_template,
+            document_name=document_name,
+            markdown_content=markdown_content,
+        )
+
     def get_user_prompt_entries(self, override: str | None = None) -> List[dict[str, object]]:
         """Return a list of user prompt definitions to execute."""
 
@@ -300,9 +502,9 @@ class Settings:
         if self.user_prompt_parts:
             for idx, path in enumerate(self.user_prompt_parts, start=1):
                 try:
-                    prompt_text = path.read_text(encoding="utf-8")
+                    prompt_text = _read_text(path)
                 except OSError as exc:
-                    logging.getLogger(__name__).error(
+                    logger.error(
                         "Failed to read user prompt part %s: %s", path, exc
                     )
                     continue
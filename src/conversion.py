@@ -1,24 +1,33 @@
 from __future__ import annotations
 
+import functools
 import logging
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable, List
 
+from docling.datamodel.base_models import InputFormat
 from docling.document_converter import DocumentConverter
 from token_count import TokenCount
 
+from .chunking import count_words, get_token_counter
 from .config import Settings
 
 logger = logging.getLogger(__name__)
 
-# Reduce noise from Hugging Face on Windows systems without symlink support.
+# Reduce noise from Hugging Face on Windows systems without symlink support. This stays at
+# import time: huggingface_hub reads it when first imported, and spawned workers re-import
+# this module before their initializer runs.
 os.environ.setdefault("HF_HUB_DISABLE_SYMLINKS_WARNING", "1")
 
+# Characters encoded and written per call when saving Markdown.
+_WRITE_WINDOW_CHARS = 1 << 20
 
-@dataclass
+
+@dataclass(slots=True)
 class ConversionResult:
     source_pdf: Path
     markdown_file: Path
@@ -27,10 +36,119 @@ class ConversionResult:
     duration_seconds: float
 
 
+def scan_pdf_entries(pdf_dir: Path) -> List[os.DirEntry]:
+    """Return the PDF entries of ``pdf_dir`` sorted by name, from a single listing.
+
+    The suffix match ignores case, so ``*.PDF`` files are picked up on every platform.
+    """
+
+    # DirEntry.is_file() reuses the type from the directory read instead of a stat per file.
+    try:
+        with os.scandir(pdf_dir) as entries:
+            pdf_entries = [
+                entry
+                for entry in entries
+                if entry.name.lower().endswith(".pdf") and entry.is_file()
+            ]
+    except FileNotFoundError:
+        return []
+    pdf_entries.sort(key=lambda entry: entry.name)
+    return pdf_entries
+
+
 def iter_pdf_files(pdf_dir: Path) -> Iterable[Path]:
     """Yield PDF files sorted by name for deterministic processing order."""
 
-    return sorted(path for path in pdf_dir.glob("*.pdf") if path.is_file())
+    return [Path(entry.path) for entry in scan_pdf_entries(pdf_dir)]
+
+
+def _existing_markdown(md_output_dir: Path) -> dict[str, os.DirEntry]:
+    """Return the Markdown files already in ``md_output_dir``, by name, from one listing."""
+
+    try:
+        with os.scandir(md_output_dir) as entries:
+            return {entry.name: entry for entry in entries if entry.name.endswith(".md")}
+    except FileNotFoundError:
+        return {}
+
+
+def markdown_is_current(pdf: os.DirEntry | Path, markdown: os.DirEntry | Path) -> bool:
+    """Return True when ``markdown`` is at least as recent as the PDF it was converted from.
+
+    Pass the ``DirEntry`` objects from the directory scans where available; they cache
+    their ``stat()`` result.
+    """
+
+    try:
+        return markdown.stat().st_mtime_ns >= pdf.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+def _write_markdown(path: Path, text: str) -> None:
+    """Write ``text`` like ``Path.write_text`` but encode one window at a time.
+
+    ``write_text`` encodes the whole document into a second, full-size bytes object
+    before writing; slicing keeps that extra copy bounded for very large exports.
+    """
+
+    with open(path, "w", encoding="utf-8", buffering=_WRITE_WINDOW_CHARS) as handle:
+        for start in range(0, len(text), _WRITE_WINDOW_CHARS):
+            handle.write(text[start : start + _WRITE_WINDOW_CHARS])
+
+
+_worker_converter: DocumentConverter | None = None
+_worker_token_counter: TokenCount | None = None
+
+
+@functools.lru_cache(maxsize=1)
+def _get_converter() -> DocumentConverter:
+    """Return the process-wide converter; its models stay loaded for the process lifetime."""
+
+    converter = DocumentConverter()
+    # Load the layout/OCR models now, while the pool starts, rather than inside the
+    # first conversion each worker picks up.
+    converter.initialize_pipeline(InputFormat.PDF)
+    return converter
+
+
+def _init_worker(token_counter_model: str) -> None:
+    """Bind the converter and tokenizer once per process instead of once per PDF.
+
+    Both come from process-level caches, so repeated in-process calls reuse the models
+    already loaded and each pool worker loads its own copy exactly once.
+    """
+
+    global _worker_converter, _worker_token_counter
+    _worker_converter = _get_converter()
+    _worker_token_counter = get_token_counter(token_counter_model)
+
+
+def _convert_one(pdf_path: Path, markdown_path: Path) -> ConversionResult:
+    assert _worker_converter is not None and _worker_token_counter is not None
+
+    start_time = time.perf_counter()
+    conversion = _worker_converter.convert(pdf_path)
+    markdown_content = conversion.document.export_to_markdown()
+    _write_markdown(markdown_path, markdown_content)
+
+    return ConversionResult(
+        source_pdf=pdf_path,
+        markdown_file=markdown_path,
+        token_count=_worker_token_counter.num_tokens_from_string(markdown_content),
+        word_count=count_words(markdown_content),
+        duration_seconds=time.perf_counter() - start_time,
+    )
+
+
+def _log_saved(result: ConversionResult) -> None:
+    logger.info(
+        "Saved Markdown to %s (tokens=%s, words=%s, duration=%.2fs)",
+        result.markdown_file,
+        result.token_count,
+        result.word_count,
+        result.duration_seconds,
+    )
 
 
 def convert_pdfs_to_markdown(settings: Settings) -> List[ConversionResult]:
@@ -38,27 +156,31 @@ def convert_pdfs_to_markdown(settings: Settings) -> List[ConversionResult]:
 
     settings.ensure_directories(include_ai=False)
 
-    converter = DocumentConverter()
-    token_counter = TokenCount(model_name=settings.token_counter_model)
     results: List[ConversionResult] = []
 
-    pdf_files = list(iter_pdf_files(settings.pdf_input_dir))
-    if not pdf_files:
+    pdf_entries = scan_pdf_entries(settings.pdf_input_dir)
+    if not pdf_entries:
         logger.warning("No PDF files found in %s", settings.pdf_input_dir)
         return results
 
-    to_convert: List[Path] = []
-    for pdf_path in pdf_files:
+    existing_md = _existing_markdown(settings.md_output_dir)
+    # (pdf_path, markdown_path) pairs: the path checked here is the one written later.
+    to_convert: List[tuple[Path, Path]] = []
+    for pdf_entry in pdf_entries:
+        pdf_path = Path(pdf_entry.path)
         markdown_filename = pdf_path.stem + ".md"
         markdown_path = settings.md_output_dir / markdown_filename
-        if markdown_path.exists():
-            logger.info(
-                "Skipping %s because Markdown already exists at %s",
-                pdf_path.name,
-                markdown_path,
-            )
-            continue
-        to_convert.append(pdf_path)
+        markdown_entry = existing_md.get(markdown_filename)
+        if markdown_entry is not None:
+            if markdown_is_current(pdf_entry, markdown_entry):
+                logger.info(
+                    "Skipping %s because Markdown already exists at %s",
+                    pdf_path.name,
+                    markdown_path,
+                )
+                continue
+            logger.info("Reconverting %s because it is newer than %s", pdf_path.name, markdown_path)
+        to_convert.append((pdf_path, markdown_path))
 
     if not to_convert:
         logger.info(
@@ -70,37 +192,43 @@ def convert_pdfs_to_markdown(settings: Settings) -> List[ConversionResult]:
 
     logger.info("Converting %s PDF(s) from %s", len(to_convert), settings.pdf_input_dir)
 
-    for pdf_path in to_convert:
-        logger.info("Converting: %s", pdf_path)
-        start_time = time.perf_counter()
-        try:
-            conversion = converter.convert(pdf_path)
-            markdown_content = conversion.document.export_to_markdown()
-            markdown_filename = pdf_path.stem + ".md"
-            markdown_path = settings.md_output_dir / markdown_filename
-            markdown_path.write_text(markdown_content, encoding="utf-8")
-
-            tokens = token_counter.num_tokens_from_string(markdown_content)
-            words = len(markdown_content.split())
-            duration = time.perf_counter() - start_time
-            logger.info(
-                "Saved Markdown to %s (tokens=%s, words=%s, duration=%.2fs)",
-                markdown_path,
-                tokens,
-                words,
-                duration,
-            )
-
-            results.append(
-                ConversionResult(
-                    source_pdf=pdf_path,
-                    markdown_file=markdown_path,
-                    token_count=tokens,
-                    word_count=words,
-                    duration_seconds=duration,
-                )
-            )
-        except Exception as exc:  # noqa: BLE001 - we log and continue
-            logger.exception("Failed to convert %s: %s", pdf_path, exc)
+    workers = min(settings.conversion_workers or os.cpu_count() or 1, len(to_convert))
+    if workers == 1:
+        _init_worker(settings.token_counter_model)
+        for pdf_path, markdown_path in to_convert:
+            logger.info("Converting: %s", pdf_path)
+            try:
+                result = _convert_one(pdf_path, markdown_path)
+            except Exception as exc:  # noqa: BLE001 - we log and continue
+                logger.exception("Failed to convert %s: %s", pdf_path, exc)
+                continue
+            _log_saved(result)
+            results.append(result)
+        return results
 
+    # Each PDF is independent and conversion is CPU-bound, so it runs in separate
+    # processes, each holding its own converter and tokenizer.
+    converted: List[ConversionResult | None] = [None] * len(to_convert)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(settings.token_counter_model,),
+    ) as executor:
+        futures = {}
+        for index, (pdf_path, markdown_path) in enumerate(to_convert):
+            logger.info("Converting: %s", pdf_path)
+            futures[executor.submit(_convert_one, pdf_path, markdown_path)] = index
+        for future in as_completed(futures):
+            index = futures[future]
+            pdf_path = to_convert[index][0]
+            try:
+                result = future.result()
+            except Exception as exc:  # noqa: BLE001 - we log and continue
+                logger.exception("Failed to convert %s: %s", pdf_path, exc)
+                continue
+            _log_saved(result)
+            converted[index] = result
+
+    # Slots stay in submission order; failed conversions leave theirs empty.
+    results.extend(result for result in converted if result is not None)
     return results